@@ -0,0 +1,72 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+import gspread
+
+import espelho
+from diagnostico import avisar
+from planilha import ler_celula
+
+# --- ACESSO ---
+# A senha fica em Config!B1 (sem a aba Config, vale SENHA_PADRAO). Ela é lida uma vez
+# por processo e guardada só como hash (SHA-256 com um sal do processo). Volta a ser
+# lida depois de VALIDADE_SENHA segundos ou quando o espelho registra outra versão da
+# planilha. Cada sessão confere a senha digitada uma vez e guarda o hash que a liberou;
+# os reruns seguintes só comparam esse hash com o vigente, sem rede.
+SENHA_PADRAO = "admin"
+VALIDADE_SENHA = int(os.environ.get("ACESSO_VALIDADE_S", "300"))
+
+_sal = os.urandom(16)
+_segredo = {}
+_trava = threading.Lock()
+
+def _resumo(senha):
+    return hashlib.sha256(_sal + str(senha).encode("utf-8")).hexdigest()
+
+def _versao_conhecida():
+    try:
+        return espelho.versao_conhecida()
+    except Exception:
+        return None
+
+def _ler_senha():
+    try:
+        return ler_celula("Config", "B1")
+    except gspread.WorksheetNotFound:
+        return SENHA_PADRAO
+
+def segredo_vigente():
+    """Hash da senha atual (relida só quando venceu) ou None se ela não pôde ser lida."""
+    versao = _versao_conhecida()
+    with _trava:
+        if _segredo and time.monotonic() - _segredo["lido_em"] < VALIDADE_SENHA and _segredo["versao"] == versao:
+            return _segredo["resumo"]
+        anterior = _segredo.get("resumo")
+
+    try:
+        senha = _ler_senha()
+        resumo = _resumo(senha) if senha else None
+    except Exception as e:
+        avisar(f"Senha não lida: {e}")
+        if anterior is None:
+            return None
+        # Planilha fora do ar: vale a última senha conhecida até a próxima tentativa
+        resumo = anterior
+    with _trava:
+        _segredo.update(resumo=resumo, lido_em=time.monotonic(), versao=versao)
+    return resumo
+
+def conferir(senha):
+    """Hash do segredo vigente se `senha` confere com ele; senão None."""
+    resumo = segredo_vigente()
+    if resumo is None or not senha or not hmac.compare_digest(_resumo(senha), resumo):
+        return None
+    return resumo
+
+def esquecer():
+    """Descarta a senha em cache: a próxima conferência relê a planilha."""
+    with _trava:
+        _segredo.clear()
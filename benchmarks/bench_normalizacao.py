@@ -0,0 +1,89 @@
+"""
+Compara a normalização célula a célula (.apply) com a vetorizada em históricos grandes.
+
+Uso: python benchmarks/bench_normalizacao.py [linhas]
+"""
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consolidacao import (  # noqa: E402
+    _coalescer,
+    converter_br_para_float,
+    converter_br_para_float_serie,
+    padronizar_data_quatro_digitos,
+    padronizar_datas_serie,
+)
+
+def gerar_historico(linhas, semente=42):
+    """
+    Valores no formato que chega das abas: a maioria já convertida para número pelo
+    gspread, o resto em texto BR; datas dd/mm/aaaa e dd/mm/aa com algumas irregulares.
+    """
+    rnd = random.Random(semente)
+    formatos = [
+        (60, lambda: rnd.randint(0, 99999)),
+        (10, lambda: rnd.randint(0, 9999) / 100.0),
+        (10, lambda: f"{rnd.randint(0, 999)},{rnd.randint(0, 99):02d}"),
+        (8, lambda: f"{rnd.randint(1, 99)}.{rnd.randint(0, 999):03d},{rnd.randint(0, 99):02d}"),
+        (5, lambda: f"R$\xa0{rnd.randint(0, 999)},{rnd.randint(0, 99):02d}"),
+        (5, lambda: ""),
+        (2, lambda: "abc"),
+    ]
+    pesos = [peso for peso, _ in formatos]
+    valores = [gerador() for _, gerador in rnd.choices(formatos, weights=pesos, k=linhas)]
+
+    def data():
+        dia, mes = rnd.randint(1, 28), rnd.randint(1, 12)
+        sorteio = rnd.random()
+        if sorteio < 0.6: return f"{dia:02d}/{mes:02d}/2025"
+        if sorteio < 0.99: return f"{dia:02d}/{mes:02d}/25"
+        if sorteio < 0.995: return f"{dia}/{mes}/25 "
+        return ""
+    datas = [data() for _ in range(linhas)]
+    com = [f"T{rnd.randint(0, 50):02d}" if rnd.random() > 0.3 else 0.0 for _ in range(linhas)]
+    aprov = [f"T{rnd.randint(0, 50):02d}" for _ in range(linhas)]
+    return pd.DataFrame({"Valor": valores, "Data": datas, "Técnico_C": com, "Técnico_A": aprov})
+
+def cronometrar(funcao, repeticoes=3):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+def main(linhas=100_000):
+    df = gerar_historico(linhas)
+    casos = [
+        ("converter_br_para_float",
+         lambda: df["Valor"].apply(converter_br_para_float),
+         lambda: converter_br_para_float_serie(df["Valor"])),
+        ("padronizar_data_quatro_digitos",
+         lambda: df["Data"].apply(padronizar_data_quatro_digitos),
+         lambda: padronizar_datas_serie(df["Data"])),
+        ("coalescer Data/Técnico",
+         lambda: df.apply(lambda x: x["Técnico_C"] if x["Técnico_C"] != 0 and str(x["Técnico_C"]) != "0" else x["Técnico_A"], axis=1),
+         lambda: _coalescer(df["Técnico_C"], df["Técnico_A"])),
+    ]
+
+    print(f"{linhas} linhas")
+    print(f"{'etapa':<34}{'apply (s)':>12}{'vetorizado (s)':>16}{'ganho':>9}")
+    total_antigo = total_novo = 0.0
+    for nome, antigo, novo in casos:
+        t_antigo, r_antigo = cronometrar(antigo, repeticoes=1)
+        t_novo, r_novo = cronometrar(novo)
+        if not r_antigo.equals(r_novo):
+            raise SystemExit(f"{nome}: resultados divergentes")
+        total_antigo += t_antigo
+        total_novo += t_novo
+        print(f"{nome:<34}{t_antigo:>12.3f}{t_novo:>16.3f}{t_antigo / t_novo:>8.1f}x")
+    print(f"{'total':<34}{total_antigo:>12.3f}{total_novo:>16.3f}{total_antigo / total_novo:>8.1f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,188 @@
+"""
+Mede cada etapa do pipeline (parse, upsert, snapshot, merge, ajustes, escrita,
+indicadores e unificação incremental) com relatórios sintéticos e uma planilha
+em memória: roda offline e sem credenciais.
+
+O histórico gerado, menos o último mês, já começa gravado nas abas; o último mês
+é o "upload" do fechamento. O resultado pode ser salvo em JSON e comparado com
+o de outra versão do código.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--tecnicos 50] [--dias 365] [--json saida.json] [--comparar base.json]
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Antes dos módulos do app: nada de cache de parse em disco
+os.environ["CACHE_PARSE_PASTA"] = ""
+
+import gerador  # noqa: E402
+import parsers  # noqa: E402
+import planilha_falsa  # noqa: E402
+from bench_normalizacao import cronometrar  # noqa: E402
+from cache_arquivos import CacheResultados  # noqa: E402
+from consolidacao import (  # noqa: E402
+    MAPA_METRICAS,
+    _df_registros,
+    aplicar_logica_ajustes,
+    aplicar_traducao_nomes,
+    carregar_snapshot,
+    montar_consolidado,
+    processar_unificacao,
+)
+from indicadores import atualizar_indicadores  # noqa: E402
+from planilha import atualizar_planilha_preservando_formato  # noqa: E402
+from registros import TabelaCompacta  # noqa: E402
+from rotina import COLUNAS_APROVEITAMENTO, COLUNAS_COMISSOES, salvar_uploads  # noqa: E402
+
+class ArquivoGerado(io.BytesIO):
+    """Relatório em memória com a mesma interface do UploadedFile do Streamlit."""
+    def __init__(self, nome, conteudo):
+        super().__init__(conteudo)
+        self.name = nome
+
+def _versao_do_codigo():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=RAIZ, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+def _sem_cache_de_parse():
+    # Cada repetição precisa parsear de verdade
+    parsers._cache_resultados = CacheResultados(max_itens=0, pasta="")
+
+def _abas_iniciais(lote, tecnicos, ajustes):
+    ultimo_com = lote["comissoes"][-1][0]
+    ultimo_aprov = lote["aproveitamento"][-1][0]
+    return {
+        "Comissoes": [COLUNAS_COMISSOES] + [l for l in lote["linhas_comissoes"] if l[1] != ultimo_com],
+        "Aproveitamento": [COLUNAS_APROVEITAMENTO] + [l for l in lote["linhas_aproveitamento"] if l[1] != ultimo_aprov],
+        "Ajustes": gerador.gerar_ajustes(lote["linhas_aproveitamento"], list(MAPA_METRICAS), ajustes),
+        "Nomes": gerador.nomes_tecnicos(tecnicos),
+    }
+
+def medir(tecnicos, dias, repeticoes=1, trabalhadores=1, motor=None, ajustes=200, semente=42):
+    """{etapa: {"segundos": ..., "linhas": ...}} e as chamadas feitas à planilha falsa."""
+    motor = motor or parsers.MOTOR_PADRAO
+    lote = gerador.gerar_periodo(tecnicos, dias, semente=semente)
+    falsa = planilha_falsa.instalar(_abas_iniciais(lote, tecnicos, ajustes))
+    _sem_cache_de_parse()
+    etapas = {}
+
+    def registrar(nome, segundos, linhas):
+        etapas[nome] = {"segundos": round(segundos, 4), "linhas": linhas}
+
+    # 1. Parse de todos os relatórios do período
+    lidos = {}
+    for tipo, parse in (("comissoes", parsers.parse_comissoes), ("aproveitamento", parsers.parse_aproveitamento)):
+        segundos, lidos[tipo] = cronometrar(lambda: parse(
+            [ArquivoGerado(nome, conteudo) for nome, conteudo in lote[tipo]],
+            motor=motor, trabalhadores=trabalhadores, ao_errar=lambda nome, erro: print(f"Erro em {nome}: {erro}")
+        ), repeticoes)
+        if lidos[tipo] != lote["linhas_" + tipo]:
+            raise SystemExit(f"parse_{tipo}: linhas diferentes das geradas")
+        registrar(f"parse_{tipo}", segundos, len(lidos[tipo]))
+
+    # 2. Reconstrução completa, etapa por etapa
+    segundos, snapshot = cronometrar(carregar_snapshot, 1)
+    registrar("snapshot", segundos, len(snapshot["Comissoes"]) + len(snapshot["Aproveitamento"]))
+
+    def merge():
+        return montar_consolidado(
+            _df_registros(snapshot["Comissoes"], COLUNAS_COMISSOES),
+            _df_registros(snapshot["Aproveitamento"], COLUNAS_APROVEITAMENTO),
+        )
+    segundos, df_final = cronometrar(merge, repeticoes)
+    registrar("merge", segundos, len(df_final))
+
+    segundos, df_final = cronometrar(lambda: aplicar_traducao_nomes(
+        aplicar_logica_ajustes(df_final.copy(), snapshot["Ajustes"]), snapshot["Nomes"]
+    ), repeticoes)
+    registrar("ajustes_nomes", segundos, len(snapshot["Ajustes"]))
+
+    segundos, _ = cronometrar(lambda: atualizar_planilha_preservando_formato("Consolidado", df_final), 1)
+    registrar("escrita_consolidado", segundos, len(df_final))
+
+    segundos, _ = cronometrar(atualizar_indicadores, 1)
+    registrar("indicadores", segundos, sum(len(aba.linhas) for nome, aba in falsa.abas.items() if nome.startswith("KPI")))
+
+    # 3. Fechamento: upload do último mês e unificação incremental
+    ultimo_com, ultimo_aprov = lote["comissoes"][-1][0], lote["aproveitamento"][-1][0]
+    tab_com = TabelaCompacta.de_linhas([l for l in lidos["comissoes"] if l[1] == ultimo_com], COLUNAS_COMISSOES)
+    tab_aprov = TabelaCompacta.de_linhas([l for l in lidos["aproveitamento"] if l[1] == ultimo_aprov], COLUNAS_APROVEITAMENTO)
+    segundos, chaves = cronometrar(lambda: salvar_uploads(tab_com, tab_aprov, lambda mensagem, progresso: None), 1)
+    registrar("upsert_upload", segundos, len(tab_com) + len(tab_aprov))
+
+    segundos, sucesso = cronometrar(lambda: processar_unificacao(chaves), 1)
+    if not sucesso:
+        raise SystemExit("unificação incremental falhou")
+    registrar("unificacao_incremental", segundos, len(chaves))
+
+    return etapas, dict(falsa.chamadas)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do pipeline com dados sintéticos.")
+    parser.add_argument("--tecnicos", type=int, default=50, help="1 a 500 (padrão: %(default)s)")
+    parser.add_argument("--dias", type=int, default=365, help="dias de histórico (padrão: %(default)s)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="melhor de N nas etapas sem efeito na planilha")
+    parser.add_argument("--trabalhadores", type=int, default=1, help="processos de parse (padrão: %(default)s)")
+    parser.add_argument("--motor", choices=list(parsers.MOTORES), help="motor de parse (padrão: o do app)")
+    parser.add_argument("--ajustes", type=int, default=200, help="linhas na aba Ajustes")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", help="grava o resultado neste arquivo")
+    parser.add_argument("--comparar", help="JSON de uma rodada anterior para comparar")
+    args = parser.parse_args(argv)
+    if not 1 <= args.tecnicos <= 500:
+        parser.error("--tecnicos precisa estar entre 1 e 500")
+
+    inicio = time.perf_counter()
+    etapas, chamadas = medir(
+        args.tecnicos, args.dias, args.repeticoes, args.trabalhadores, args.motor, args.ajustes, args.semente
+    )
+    resultado = {
+        "versao": _versao_do_codigo(),
+        "python": sys.version.split()[0],
+        "parametros": {
+            "tecnicos": args.tecnicos, "dias": args.dias, "repeticoes": args.repeticoes,
+            "trabalhadores": args.trabalhadores, "motor": args.motor or parsers.MOTOR_PADRAO,
+            "ajustes": args.ajustes, "semente": args.semente,
+        },
+        "etapas": etapas,
+        "chamadas_planilha": chamadas,
+        "total_s": round(time.perf_counter() - inicio, 2),
+    }
+
+    base = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        if base.get("parametros") != resultado["parametros"]:
+            print(f"Atenção: parâmetros diferentes da base ({base.get('parametros')})")
+
+    print(f"{args.tecnicos} técnicos, {args.dias} dias, versão {resultado['versao'] or '?'}")
+    print(f"{'etapa':<26}{'linhas':>10}{'tempo (s)':>12}" + (f"{'base (s)':>12}{'razão':>9}" if base else ""))
+    for nome, etapa in etapas.items():
+        linha = f"{nome:<26}{etapa['linhas']:>10}{etapa['segundos']:>12.3f}"
+        anterior = base.get("etapas", {}).get(nome)
+        if anterior:
+            linha += f"{anterior['segundos']:>12.3f}{etapa['segundos'] / max(anterior['segundos'], 1e-9):>8.2f}x"
+        print(linha)
+    print("chamadas à planilha: " + ", ".join(f"{metodo}={n}" for metodo, n in sorted(chamadas.items())))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Relatórios sintéticos no formato exportado pelo ERP (Comissões e Aproveitamento),
+para medir o pipeline sem dados reais.
+
+Um relatório de Comissões por mês (competência = último dia do período) e um de
+Aproveitamento por mês, com uma linha por técnico e dia útil. As linhas que os
+parsers devem extrair também são devolvidas, prontas para servir de histórico.
+
+Uso: python benchmarks/gerador.py PASTA [--tecnicos 50] [--dias 365] [--semente 42]
+"""
+import argparse
+import calendar
+import os
+import random
+from datetime import date, timedelta
+
+DIAS_SEMANA = ["SEG", "TER", "QUA", "QUI", "SEX", "SAB", "DOM"]
+NOMES = ["JOÃO", "JOSÉ", "ANTÔNIO", "MÁRCIO", "SÉRGIO", "FÁBIO", "LUÍS", "ANDRÉ", "CLÁUDIO", "VINÍCIUS"]
+SOBRENOMES = ["SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "CONCEIÇÃO", "GONÇALVES", "ARAÚJO", "LIMA"]
+CABECALHO_HTML = (
+    '<html><head><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1">'
+    "<title>{titulo}</title><style>td {{ font-family: Courier; }}</style></head><body>"
+)
+
+def siglas(tecnicos):
+    """Siglas de 3 letras (AAA, AAB, ...) na ordem, como as do ERP."""
+    return [
+        "".join(chr(65 + (i // 26 ** p) % 26) for p in (2, 1, 0))
+        for i in range(tecnicos)
+    ]
+
+def nome_tecnico(i):
+    """Nome completo do i-ésimo técnico, distinto para até 640 técnicos."""
+    return f"{NOMES[i % 10]} {SOBRENOMES[i // 10 % 8]} {SOBRENOMES[i // 80 % 8]}"
+
+def _horas(rnd, minimo, maximo):
+    centesimos = rnd.randint(minimo * 100, maximo * 100)
+    return f"{centesimos // 100},{centesimos % 100:02d}"
+
+def meses_do_periodo(inicio, dias):
+    """(primeiro dia, último dia) de cada mês tocado pelo período, cortado nas pontas."""
+    fim = inicio + timedelta(days=dias - 1)
+    meses, atual = [], inicio
+    while atual <= fim:
+        ultimo = date(atual.year, atual.month, calendar.monthrange(atual.year, atual.month)[1])
+        meses.append((atual, min(ultimo, fim)))
+        atual = ultimo + timedelta(days=1)
+    return meses
+
+def gerar_comissoes(tecnicos, inicio, fim, semente=42):
+    """(bytes Latin-1 do relatório, linhas [Data, Arquivo, Sigla, Horas] que ele produz)."""
+    rnd = random.Random(f"com-{semente}-{inicio}")
+    competencia = fim.strftime("%d/%m/%Y")
+    nome_arquivo = f"comissoes_{fim:%Y_%m}.html"
+    partes = [
+        CABECALHO_HTML.format(titulo="Pagamento de Comissões"),
+        "<table><tr><td><b>PAGAMENTO DE COMISSÕES</b></td>"
+        f"<td>Período: {inicio:%d/%m/%Y} até {competencia}</td></tr></table><table>",
+    ]
+    linhas = []
+    for i, sigla in enumerate(siglas(tecnicos)):
+        for _ in range(rnd.randint(2, 6)):
+            partes.append(
+                f"<tr><td>OS {rnd.randint(10000, 99999)}</td><td>{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)}</td>"
+                f"<td align=right>{_horas(rnd, 1, 40)}</td></tr>"
+            )
+        partes.append(f"<tr><td colspan=3><b>TOTAL DO FUNCIONARIO: {sigla} - {nome_tecnico(i)}</b></td></tr>")
+        horas = _horas(rnd, 20, 220)
+        partes.append(f"<tr><td>HORAS VENDIDAS:</td><td align=right>{horas} HORAS</td><td>&nbsp;</td></tr>")
+        linhas.append([competencia, nome_arquivo, sigla, horas])
+    partes.append("<tr><td>TOTAL DA FILIAL</td><td>0,00 HORAS</td></tr></table></body></html>")
+    return "".join(partes).encode("latin-1"), linhas
+
+def gerar_aproveitamento(tecnicos, inicio, fim, semente=42):
+    """(bytes Latin-1 do relatório, linhas [Data, Arquivo, Técnico, Disp, TP, TG] que ele produz)."""
+    rnd = random.Random(f"apr-{semente}-{inicio}")
+    nome_arquivo = f"aproveitamento_{fim:%Y_%m}.slk"
+    partes = [CABECALHO_HTML.format(titulo="Aproveitamento de Tempo Mecânico"), "<table>"]
+    linhas = []
+    dias_uteis = [inicio + timedelta(days=d) for d in range((fim - inicio).days + 1)]
+    dias_uteis = [d for d in dias_uteis if d.weekday() < 6]
+    for i, sigla in enumerate(siglas(tecnicos)):
+        partes.append(f"<tr><td>MECÂNICO: {sigla} - {nome_tecnico(i)}</td></tr>")
+        partes.append("<tr><td>DATA</td><td>T. DISP</td><td>T. PADRÃO</td><td>T. GASTO</td></tr>")
+        for dia in dias_uteis:
+            disp, tp, tg = _horas(rnd, 4, 9), _horas(rnd, 0, 12), _horas(rnd, 0, 9)
+            data = dia.strftime("%d/%m/%y")
+            partes.append(
+                f"<tr><td>{data} {DIAS_SEMANA[dia.weekday()]}</td><td align=right>{disp}</td>"
+                f"<td align=right>{tp}</td><td align=right>{tg}</td></tr>"
+            )
+            linhas.append([data, nome_arquivo, sigla, disp, tp, tg])
+        partes.append(f"<tr><td>TOT.MEC.:</td><td>{len(dias_uteis)}</td></tr>")
+    partes.append("<tr><td>TOTAL FILIAL:</td></tr></table></body></html>")
+    return "".join(partes).encode("latin-1"), linhas
+
+def gerar_periodo(tecnicos, dias, inicio=date(2024, 1, 1), semente=42):
+    """
+    Relatórios e linhas esperadas de `dias` dias de histórico para `tecnicos` técnicos.
+    Retorna {"comissoes": [(nome, bytes)], "aproveitamento": [...], "linhas_comissoes": [...], "linhas_aproveitamento": [...]}.
+    """
+    lote = {"comissoes": [], "aproveitamento": [], "linhas_comissoes": [], "linhas_aproveitamento": []}
+    for primeiro, ultimo in meses_do_periodo(inicio, dias):
+        for tipo, gerar in (("comissoes", gerar_comissoes), ("aproveitamento", gerar_aproveitamento)):
+            conteudo, linhas = gerar(tecnicos, primeiro, ultimo, semente)
+            lote[tipo].append((linhas[0][1] if linhas else f"{tipo}_{ultimo:%Y_%m}", conteudo))
+            lote["linhas_" + tipo].extend(linhas)
+    return lote
+
+def gerar_ajustes(linhas_aproveitamento, metricas, quantidade, semente=42):
+    """Linhas da aba Ajustes (Data, Técnico, Métrica, Valor) sobre dias/técnicos que existem."""
+    rnd = random.Random(f"aju-{semente}")
+    ajustes = [["Data", "Técnico", "Métrica", "Valor"]]
+    for data, _, sigla, *_ in rnd.sample(linhas_aproveitamento, min(quantidade, len(linhas_aproveitamento))):
+        dia, mes, ano = data.split("/")
+        ajustes.append([f"{dia}/{mes}/20{ano}", sigla, rnd.choice(metricas), f"{rnd.choice('-+')}{rnd.randint(1, 300)},{rnd.randint(0, 9)}".lstrip("+")])
+    return ajustes
+
+def nomes_tecnicos(tecnicos):
+    """Linhas da aba Nomes (Sigla, Nome) para os técnicos gerados."""
+    return [["Sigla", "Nome"]] + [[sigla, nome_tecnico(i)] for i, sigla in enumerate(siglas(tecnicos))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera relatórios sintéticos de Comissões e Aproveitamento.")
+    parser.add_argument("pasta")
+    parser.add_argument("--tecnicos", type=int, default=50, help="1 a 500 (padrão: %(default)s)")
+    parser.add_argument("--dias", type=int, default=365, help="dias de histórico (padrão: %(default)s)")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args(argv)
+    if not 1 <= args.tecnicos <= 500:
+        parser.error("--tecnicos precisa estar entre 1 e 500")
+
+    lote = gerar_periodo(args.tecnicos, args.dias, semente=args.semente)
+    for tipo in ("comissoes", "aproveitamento"):
+        pasta = os.path.join(args.pasta, tipo)
+        os.makedirs(pasta, exist_ok=True)
+        for nome, conteudo in lote[tipo]:
+            with open(os.path.join(pasta, nome), "wb") as f:
+                f.write(conteudo)
+    print(f"{len(lote['comissoes'])} relatórios de Comissões e {len(lote['aproveitamento'])} de Aproveitamento em {args.pasta}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Planilha em memória com a parte da API do gspread que o app usa, para medir
+upsert, unificação e escrita sem rede. Cada chamada é contada por método.
+
+    falsa = instalar({"Comissoes": [[...cabeçalho...], ...], ...})
+    ...  # código do app, que agora lê e grava em `falsa`
+    falsa.chamadas  # {"values_batch_get": 1, "batch_update": 3, ...}
+"""
+import os
+import tempfile
+from collections import Counter
+
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range, a1_to_rowcol
+
+def _formatado(valor):
+    # Como a planilha em pt-BR devolve números gravados em RAW: vírgula decimal
+    if isinstance(valor, bool):
+        return "TRUE" if valor else "FALSE"
+    if isinstance(valor, float):
+        return ("%.10g" % valor).replace(".", ",") if valor != int(valor) else str(int(valor))
+    return "" if valor is None else str(valor)
+
+def _sem_vazios_no_fim(linhas):
+    linhas = [list(l) for l in linhas]
+    for linha in linhas:
+        while linha and linha[-1] == "":
+            linha.pop()
+    while linhas and not linhas[-1]:
+        linhas.pop()
+    return linhas
+
+class AbaFalsa:
+    def __init__(self, planilha, titulo, linhas=None):
+        self._planilha = planilha
+        self.title = titulo
+        self.id = len(planilha.abas)
+        self.linhas = [list(l) for l in linhas or []]
+
+    def _contar(self, metodo):
+        self._planilha.chamadas[metodo] += 1
+
+    def _gravar(self, linha, coluna, valores):
+        for i, nova in enumerate(valores):
+            while len(self.linhas) < linha + i:
+                self.linhas.append([])
+            atual = self.linhas[linha + i - 1]
+            if len(atual) < coluna - 1 + len(nova):
+                atual.extend([""] * (coluna - 1 + len(nova) - len(atual)))
+            atual[coluna - 1:coluna - 1 + len(nova)] = nova
+        self._planilha.editar()
+
+    def valores(self, formatados=True):
+        linhas = _sem_vazios_no_fim(self.linhas)
+        largura = max([len(l) for l in linhas] + [0])
+        converter = _formatado if formatados else (lambda v: v)
+        return [[converter(v) for v in l] + [""] * (largura - len(l)) for l in linhas]
+
+    def get_all_values(self, **kwargs):
+        self._contar("get_all_values")
+        return self.valores() or [[]]
+
+    def get_values(self, range_name=None, value_render_option=None, **kwargs):
+        self._contar("get_values")
+        return self.valores(formatados=value_render_option is None or value_render_option == "FORMATTED_VALUE") or [[]]
+
+    def update(self, range_name, values=None, **kwargs):
+        self._contar("update")
+        self._gravar(*a1_to_rowcol(range_name.split(":")[0]), values)
+
+    def format(self, *args, **kwargs):
+        self._contar("format")
+        self._planilha.editar()
+
+    def batch_update(self, data, **kwargs):
+        self._contar("batch_update")
+        for intervalo in data:
+            self._gravar(*a1_to_rowcol(intervalo["range"].split(":")[0]), intervalo["values"])
+
+    def batch_clear(self, ranges):
+        self._contar("batch_clear")
+        for intervalo in ranges:
+            grade = a1_range_to_grid_range(intervalo)
+            for linha in self.linhas[grade.get("startRowIndex", 0):grade.get("endRowIndex")]:
+                for c in range(grade.get("startColumnIndex", 0), min(len(linha), grade.get("endColumnIndex", len(linha)))):
+                    linha[c] = ""
+        self._planilha.editar()
+
+    def append_rows(self, values, **kwargs):
+        self._contar("append_rows")
+        self.linhas = _sem_vazios_no_fim(self.linhas) + [list(l) for l in values]
+        self._planilha.editar()
+
+    def append_row(self, values, **kwargs):
+        self._contar("append_row")
+        self.linhas = _sem_vazios_no_fim(self.linhas) + [list(values)]
+        self._planilha.editar()
+
+class PlanilhaFalsa:
+    def __init__(self, abas=None):
+        self.chamadas = Counter()
+        self.versao = 1
+        self.escritas = 0
+        self.abas = {}
+        for titulo, linhas in (abas or {}).items():
+            self.abas[titulo] = AbaFalsa(self, titulo, linhas)
+
+    def editar(self, externa=False):
+        # Como a versão do arquivo no Drive: sobe 1 a cada requisição de escrita.
+        # As do app também entram na conta de escritas respondidas (cota.py)
+        self.versao += 1
+        if not externa:
+            self.escritas += 1
+
+    def worksheets(self):
+        self.chamadas["worksheets"] += 1
+        return list(self.abas.values())
+
+    def worksheet(self, titulo):
+        self.chamadas["worksheet"] += 1
+        if titulo not in self.abas:
+            raise WorksheetNotFound(titulo)
+        return self.abas[titulo]
+
+    def add_worksheet(self, title, rows, cols, **kwargs):
+        self.chamadas["add_worksheet"] += 1
+        self.abas[title] = AbaFalsa(self, title)
+        self.editar()
+        return self.abas[title]
+
+    def values_batch_get(self, ranges, params=None):
+        self.chamadas["values_batch_get"] += 1
+        intervalos = []
+        for intervalo in ranges:
+            titulo, _, celulas = intervalo.partition("!")
+            valores = self.abas[titulo.strip("'").replace("''", "'")].valores()
+            if celulas:
+                grade = a1_range_to_grid_range(celulas)
+                valores = _sem_vazios_no_fim(
+                    l[grade.get("startColumnIndex", 0):grade.get("endColumnIndex")]
+                    for l in valores[grade.get("startRowIndex", 0):grade.get("endRowIndex")]
+                )
+            intervalos.append({"range": intervalo, "values": valores} if valores else {"range": intervalo})
+        return {"valueRanges": intervalos}
+
+def instalar(abas=None, pasta_espelho=None):
+    """
+    Troca a planilha do app por uma PlanilhaFalsa com `abas` ({título: linhas})
+    e aponta o espelho SQLite para uma pasta temporária. Retorna a planilha falsa.
+    Edições feitas direto nas abas (fora do app) devem chamar `falsa.editar(externa=True)`.
+    """
+    import espelho
+    import planilha
+    import tecnicos
+
+    falsa = PlanilhaFalsa(abas)
+    espelho.CAMINHO_ESPELHO = os.path.join(pasta_espelho or tempfile.mkdtemp(prefix="bench_espelho_"), "espelho.sqlite")
+    espelho.invalidar()
+    planilha.abrir_planilha = lambda: falsa
+    planilha.versao_planilha = lambda: falsa.versao
+    planilha._escritas_feitas = lambda: falsa.escritas
+    planilha.esquecer_abas()
+    tecnicos.esquecer()
+    return falsa
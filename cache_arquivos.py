@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from diagnostico import avisar
+
+# --- CACHE DE RESULTADOS POR CONTEÚDO ---
+# Chave = SHA-256 dos bytes do arquivo + extrator, motor de parse e versão do parser.
+# Camada 1: LRU em memória (vale para todos os reruns e sessões do processo).
+# Camada 2 (opcional): arquivos JSON em disco, com descarte dos menos usados
+# quando a pasta passa de MAX_BYTES_DISCO. CACHE_PARSE_PASTA="" desliga o disco.
+MAX_ITENS_MEMORIA = 256
+PASTA_DISCO = os.environ.get("CACHE_PARSE_PASTA", os.path.join(".cache", "parse"))
+MAX_BYTES_DISCO = int(os.environ.get("CACHE_PARSE_MAX_MB", "200")) * 1024 * 1024
+
+def calcular_chave(bruto, *partes):
+    digest = hashlib.sha256(bruto).hexdigest()
+    return "-".join([str(p) for p in partes] + [digest])
+
+class CacheResultados:
+    def __init__(self, max_itens=MAX_ITENS_MEMORIA, pasta=PASTA_DISCO, max_bytes=MAX_BYTES_DISCO):
+        self.max_itens = max_itens
+        self.pasta = pasta
+        self.max_bytes = max_bytes
+        self._memoria = OrderedDict()
+        self._trava = threading.Lock()
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, chave + ".json")
+
+    def _guardar_memoria(self, chave, valor):
+        self._memoria[chave] = valor
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens:
+            self._memoria.popitem(last=False)
+
+    def obter(self, chave):
+        with self._trava:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+        if not self.pasta:
+            return None
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                valor = json.load(f)
+            os.utime(caminho)  # marca como usado recentemente para o descarte
+        except (OSError, ValueError):
+            return None
+        with self._trava:
+            self._guardar_memoria(chave, valor)
+        return valor
+
+    def guardar(self, chave, valor):
+        with self._trava:
+            self._guardar_memoria(chave, valor)
+        if not self.pasta:
+            return
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            temporario = self._caminho(chave) + ".tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(valor, f, ensure_ascii=False)
+            os.replace(temporario, self._caminho(chave))
+            self._descartar_excesso()
+        except OSError as e:
+            avisar(f"Cache de parse em disco indisponível: {e}")
+
+    def _descartar_excesso(self):
+        arquivos = []
+        for entrada in os.scandir(self.pasta):
+            if entrada.name.endswith(".json"):
+                info = entrada.stat()
+                arquivos.append((info.st_mtime, info.st_size, entrada.path))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+
+    def limpar(self):
+        with self._trava:
+            self._memoria.clear()
+        if self.pasta and os.path.isdir(self.pasta):
+            for entrada in os.scandir(self.pasta):
+                if entrada.name.endswith(".json"):
+                    os.remove(entrada.path)
@@ -0,0 +1,421 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+import tecnicos
+from diagnostico import avisar, etapa
+from espelho import mes_competencia
+from exportacao import exportar_consolidado, na_janela
+from indicadores import atualizar_indicadores
+from planilha import atualizar_linhas_por_chave, atualizar_planilha_preservando_formato, ler_snapshot, registros_de_valores
+
+log = logging.getLogger("consolidacao")
+
+# --- AUXILIARES ---
+def converter_br_para_float(valor):
+    """
+    Limpa o valor para garantir que seja processável como número.
+    Nota: A divisão por 100 ocorrerá APENAS na exportação final.
+    """
+    if pd.isna(valor) or valor == "": 
+        return 0.0
+    
+    if isinstance(valor, (int, float)): 
+        return float(valor)
+    
+    valor_str = str(valor).strip()
+    valor_str = valor_str.replace('\xa0', '').replace('R$', '').strip()
+
+    if not valor_str:
+        return 0.0
+
+    # Remove ponto de milhar se existir
+    if '.' in valor_str and ',' in valor_str: 
+        valor_str = valor_str.replace('.', '')
+    
+    # Troca vírgula por ponto para o Python entender
+    valor_str = valor_str.replace(',', '.')
+
+    try: 
+        return float(valor_str)
+    except: 
+        return 0.0
+
+def padronizar_data_quatro_digitos(data_str):
+    """
+    Transforma '08/12/25' em '08/12/2025'.
+    Garante que as chaves de data sejam idênticas para o merge.
+    """
+    if pd.isna(data_str) or data_str == "":
+        return ""
+    
+    data_str = str(data_str).strip()
+    
+    # Verifica se tem barras
+    if '/' in data_str:
+        partes = data_str.split('/')
+        # Se tiver 3 partes (dia, mes, ano)
+        if len(partes) == 3:
+            dia, mes, ano = partes
+            # Se o ano tiver apenas 2 dígitos, adiciona '20' na frente
+            if len(ano) == 2:
+                ano = '20' + ano
+            
+            # Reconstrói a data padronizada com zeros à esquerda se precisar
+            return f"{dia.zfill(2)}/{mes.zfill(2)}/{ano}"
+            
+    return data_str
+
+# --- NORMALIZAÇÃO VETORIZADA ---
+# Mesmas regras das funções acima, aplicadas à coluna inteira com métodos .str do pandas
+# sobre strings Arrow (pyarrow, em requirements.txt). Só os formatos comuns passam
+# pelo caminho vetorizado; o resto cai na função célula a célula, que é a referência.
+_RE_NUMERO_SIMPLES = r'[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?'
+_ESPACOS_ASCII = " \t\n\r\x0b\x0c"
+
+def _textos_arrow(valores):
+    return pd.Series(valores, dtype="string[pyarrow]")
+
+def _mascara_texto(valores):
+    return np.fromiter((type(v) is str for v in valores), dtype=bool, count=len(valores))
+
+def _numeros_simples(textos):
+    """(máscara dos textos que são número simples, valores float deles; 0.0 nos demais)."""
+    simples = textos.str.fullmatch(_RE_NUMERO_SIMPLES).to_numpy(dtype=bool)
+    numeros = np.zeros(len(textos), dtype=float)
+    if simples.any():
+        numeros[simples] = textos[simples].astype(float).to_numpy()
+    return simples, numeros
+
+def converter_br_para_float_serie(serie):
+    """Versão vetorizada de converter_br_para_float (R$, \\xa0, milhar com ponto, vírgula decimal)."""
+    valores = serie.to_numpy(dtype=object)
+    resultado = np.zeros(len(valores), dtype=float)
+    if not len(valores):
+        return pd.Series(resultado, index=serie.index)
+
+    eh_texto = _mascara_texto(valores)
+    numeros = ~eh_texto & pd.notna(valores)
+    if numeros.any():
+        try: resultado[numeros] = valores[numeros].astype(float)
+        except (TypeError, ValueError): resultado[numeros] = [converter_br_para_float(v) for v in valores[numeros]]
+
+    if eh_texto.any():
+        originais = valores[eh_texto]
+        textos = _textos_arrow(originais)
+        textos = textos.str.strip(_ESPACOS_ASCII).str.replace('\xa0', '', regex=False)
+        textos = textos.str.replace('R$', '', regex=False).str.strip(_ESPACOS_ASCII)
+
+        # Com vírgula, o ponto é milhar ("1.234,50" -> 1234.5); sem vírgula o texto vale como está
+        com_virgula = textos.str.contains(',', regex=False).to_numpy(dtype=bool)
+        simples, convertidos = _numeros_simples(textos)
+        if com_virgula.any():
+            simples_br, convertidos_br = _numeros_simples(textos.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+            simples = np.where(com_virgula, simples_br, simples)
+            convertidos = np.where(com_virgula, convertidos_br, convertidos)
+
+        vazios = textos.eq("").to_numpy(dtype=bool)
+        outros = ~simples & ~vazios
+        if outros.any():
+            # Espaços unicode, "1e3", "1_000", "nan"...: regra exata, célula a célula
+            convertidos[outros] = [converter_br_para_float(v) for v in originais[outros]]
+        resultado[eh_texto] = convertidos
+
+    return pd.Series(resultado, index=serie.index)
+
+def padronizar_datas_serie(serie):
+    """Versão vetorizada de padronizar_data_quatro_digitos."""
+    valores = serie.to_numpy(dtype=object)
+    resultado = np.empty(len(valores), dtype=object)
+    if not len(valores):
+        return pd.Series(resultado, index=serie.index)
+
+    eh_texto = _mascara_texto(valores)
+    textos = _textos_arrow(np.where(eh_texto, valores, ""))
+    regular = textos.str.fullmatch(r'[0-9]{2}/[0-9]{2}/[0-9]{2}(?:[0-9]{2})?').to_numpy(dtype=bool) & eh_texto
+    curta = regular & (textos.str.len().to_numpy() == 8)
+    completa = regular & ~curta
+
+    # dd/mm/aaaa já está no formato final; dd/mm/aa só ganha o "20" no ano
+    resultado[completa] = valores[completa]
+    if curta.any():
+        resultado[curta] = (textos[curta].str.slice(0, 6) + "20" + textos[curta].str.slice(6)).to_numpy(dtype=object)
+    outros = ~(completa | curta)
+    if outros.any():
+        resultado[outros] = [padronizar_data_quatro_digitos(v) for v in valores[outros]]
+    return pd.Series(resultado, index=serie.index)
+
+def _coalescer(preferida, reserva):
+    # Mesma regra do apply antigo: usa a coluna de Comissões se não for 0 / "0"
+    usar_preferida = preferida.ne(0) & preferida.astype(str).ne("0")
+    return preferida.where(usar_preferida, reserva)
+
+# --- FUNÇÃO: APLICAR LÓGICA DE AJUSTES ---
+MAPA_METRICAS = {
+    "Horas Vendidas (HV)": "Horas Vendidas",
+    "Tempo Padrão (TP)": "TP",
+    "Tempo Disponível (Disp)": "Disp",
+    "Tempo Garantia (TG)": "TG"
+}
+COLUNAS_AJUSTE = ['Data', 'Técnico', 'Métrica', 'Valor']
+
+def _valor_ajuste(valor):
+    try:
+        numero = float(str(valor).replace(',', '.'))
+    except (TypeError, ValueError):
+        return np.nan
+    return numero if np.isfinite(numero) else np.nan
+
+def validar_ajustes(dados_ajustes):
+    """
+    Separa os registros da aba Ajustes em válidos e inválidos.
+    Retorna (DataFrame Data/Técnico/Métrica/Valor já convertidos, lista de (linha na aba, motivo)).
+    """
+    df = pd.DataFrame(dados_ajustes)
+    faltando = [c for c in COLUNAS_AJUSTE if c not in df.columns]
+    if faltando:
+        motivo = f"coluna(s) ausente(s) na aba: {', '.join(faltando)}"
+        return pd.DataFrame(columns=COLUNAS_AJUSTE), [(i + 2, motivo) for i in range(len(df))]
+
+    # Poucas datas distintas: cada uma é convertida uma vez só, com a mesma regra de antes
+    datas = {d: pd.to_datetime(d, dayfirst=True, errors='coerce') for d in df['Data'].unique()}
+    validos = pd.DataFrame({
+        'Data': df['Data'].map(datas),
+        'Técnico': df['Técnico'].astype(str).str.strip(),
+        'Métrica': df['Métrica'].map(MAPA_METRICAS),
+        'Valor': df['Valor'].map(_valor_ajuste),
+    })
+
+    motivos = pd.Series("", index=df.index)
+    motivos[validos['Valor'].isna()] = "valor inválido"
+    motivos[validos['Métrica'].isna()] = "métrica desconhecida"
+    motivos[validos['Técnico'].eq("")] = "técnico vazio"
+    motivos[validos['Data'].isna()] = "data inválida"
+    invalidos = motivos.ne("")
+
+    lista_invalidos = [(i + 2, motivo) for i, motivo in motivos[invalidos].items()]
+    return validos[~invalidos], lista_invalidos
+
+def aplicar_logica_ajustes(df_base, dados_ajustes):
+    """
+    Soma os ajustes (registros da aba Ajustes) ao Consolidado: um groupby por
+    (Data, Técnico, Métrica), pivotado em colunas de métrica e alinhado às linhas de df_base de uma vez.
+    """
+    try:
+        if not dados_ajustes:
+            return df_base
+
+        df_ajustes, invalidos = validar_ajustes(dados_ajustes)
+        if invalidos:
+            avisar(f"Ajustes ignorados ({len(invalidos)}): " + "; ".join(f"linha {l}: {m}" for l, m in invalidos))
+
+        df_ajustes = df_ajustes[df_ajustes['Métrica'].isin(df_base.columns)]
+        if df_ajustes.empty or df_base.empty:
+            return df_base
+
+        por_metrica = df_ajustes.groupby(['Data', 'Técnico', 'Métrica'])['Valor'].sum().unstack('Métrica')
+
+        chaves_base = pd.MultiIndex.from_arrays([
+            pd.to_datetime(df_base['Data'], dayfirst=True, errors='coerce'),
+            df_base['Técnico']
+        ])
+        deltas = por_metrica.reindex(chaves_base)
+        for metrica in por_metrica.columns:
+            df_base[metrica] = df_base[metrica] + deltas[metrica].fillna(0.0).to_numpy()
+            
+        return df_base
+
+    except Exception as e:
+        avisar(f"Erro ajustes: {e}")
+        return df_base
+
+# --- NOVA FUNÇÃO: TRADUZIR NOMES (VERSÃO BLINDADA) ---
+def aplicar_traducao_nomes(df_final, todas_linhas):
+    """
+    Aplica a tradução a partir das linhas da aba 'Nomes', ignorando o cabeçalho.
+    Coluna A = Sigla
+    Coluna B = Nome
+    O dicionário fica em cache no diretório de técnicos (tecnicos.py).
+    """
+    try:
+        if todas_linhas is None:
+            avisar("Aba 'Nomes' não lida: aba não encontrada")
+            return df_final
+
+        dicionario_nomes = tecnicos.dicionario_nomes(todas_linhas)
+        if dicionario_nomes:
+            # Aplica a troca na coluna Técnico
+            df_final['Técnico'] = tecnicos.traduzir_tecnicos(df_final['Técnico'], dicionario_nomes)
+            log.info("Tradução aplicada: %d nomes encontrados.", len(dicionario_nomes))
+            
+        return df_final
+        
+    except Exception as e:
+        avisar(f"Erro na tradução de nomes: {e}")
+        return df_final
+
+# --- UNIFICAÇÃO ---
+ABAS_ENTRADA = ["Comissoes", "Aproveitamento", "Ajustes", "Nomes"]
+# Coluna de data de cada aba bruta: define a partição (mês de competência) de cada linha
+PARTICOES_POR_MES = {"Comissoes": "Data Processamento", "Aproveitamento": "Data"}
+
+def carregar_snapshot(meses=None):
+    """
+    Todas as abas de entrada da unificação, lidas no mesmo instante e numa só
+    chamada à API (ver planilha.ler_snapshot). Comissões, Aproveitamento e Ajustes
+    voltam como registros; Nomes como linhas. Aba inexistente vem como None.
+    Com `meses`, Comissões e Aproveitamento trazem só as partições desses meses.
+    """
+    valores = ler_snapshot(ABAS_ENTRADA, meses, PARTICOES_POR_MES)
+    snapshot = {
+        nome: None if valores[nome] is None else registros_de_valores(nome, valores[nome])
+        for nome in ["Comissoes", "Aproveitamento", "Ajustes"]
+    }
+    snapshot["Nomes"] = valores["Nomes"]
+    return snapshot
+
+COLUNAS_CONSOLIDADO = ['Data', 'Técnico', 'Horas Vendidas', 'Disp', 'TP', 'TG']
+
+def extrair_chaves(df, col_data, col_tecnico):
+    """Conjunto de chaves (Data dd/mm/aaaa, Técnico) presentes em um upload ou ajuste."""
+    if df is None or df.empty:
+        return set()
+    datas = padronizar_datas_serie(df[col_data])
+    return set(zip(datas, df[col_tecnico].astype(str)))
+
+def _filtrar_por_chaves(df, chaves):
+    # Corta primeiro pelo técnico (barato) e só depois padroniza as datas que sobraram
+    tecnicos = {t for _, t in chaves}
+    df = df[df['Técnico'].astype(str).isin(tecnicos)].copy()
+    df['Data'] = padronizar_datas_serie(df['Data'])
+    pares = zip(df['Data'].astype(str), df['Técnico'].astype(str))
+    # Máscara numpy: uma lista vazia em df[[]] selecionaria colunas, não linhas
+    return df[np.fromiter((par in chaves for par in pares), dtype=bool, count=len(df))].copy()
+
+def montar_consolidado(df_com, df_aprov, chaves=None):
+    """
+    Junta Comissões e Aproveitamento por (Data, Técnico) e divide as horas por 100.
+    Com `chaves`, só as linhas dessas chaves entram no merge.
+    """
+    # Limpeza e Padronização
+    df_com.columns = [c.strip() for c in df_com.columns]
+    df_aprov.columns = [c.strip() for c in df_aprov.columns]
+    renomear_comissao = {"Data Processamento": "Data", "Sigla Técnico": "Técnico"}
+    df_com.rename(columns=renomear_comissao, inplace=True)
+
+    cols_com = ['Data', 'Técnico', 'Horas Vendidas']
+    df_com = df_com[[c for c in cols_com if c in df_com.columns]]
+    cols_aprov = ['Data', 'Técnico', 'Disp', 'TP', 'TG']
+    df_aprov = df_aprov[[c for c in cols_aprov if c in df_aprov.columns]]
+
+    if chaves is not None:
+        df_com = _filtrar_por_chaves(df_com, chaves)
+        df_aprov = _filtrar_por_chaves(df_aprov, chaves)
+        if df_com.empty and df_aprov.empty:
+            return pd.DataFrame(columns=COLUNAS_CONSOLIDADO)
+
+    if 'Data' in df_com.columns:
+        df_com['Data'] = padronizar_datas_serie(df_com['Data'])
+    
+    if 'Data' in df_aprov.columns:
+        df_aprov['Data'] = padronizar_datas_serie(df_aprov['Data'])
+
+    cols_numericas = ['Horas Vendidas', 'Disp', 'TP', 'TG']
+    for col in cols_numericas:
+        if col in df_com.columns: df_com[col] = converter_br_para_float_serie(df_com[col])
+        if col in df_aprov.columns: df_aprov[col] = converter_br_para_float_serie(df_aprov[col])
+
+    df_com['Key_D'] = df_com['Data'].astype(str)
+    df_com['Key_T'] = df_com['Técnico'].astype(str)
+    df_aprov['Key_D'] = df_aprov['Data'].astype(str)
+    df_aprov['Key_T'] = df_aprov['Técnico'].astype(str)
+
+    df_final = pd.merge(
+        df_com, df_aprov, 
+        left_on=['Key_D', 'Key_T'], right_on=['Key_D', 'Key_T'], 
+        how='outer', suffixes=('_C', '_A')
+    )
+    df_final.fillna(0.0, inplace=True)
+    
+    df_final['Data'] = _coalescer(df_final['Data_C'], df_final['Data_A'])
+    df_final['Técnico'] = _coalescer(df_final['Técnico_C'], df_final['Técnico_A'])
+
+    df_final = df_final[[c for c in COLUNAS_CONSOLIDADO if c in df_final.columns]]
+
+    # DIVIDIR POR 100
+    for col in ['Horas Vendidas', 'Disp', 'TP', 'TG']:
+         if col in df_final.columns:
+             df_final[col] = df_final[col] / 100.0
+
+    return df_final
+
+def _df_registros(registros, colunas):
+    # Partição sem linhas ainda precisa das colunas para o merge
+    return pd.DataFrame(registros) if registros else pd.DataFrame(columns=colunas)
+
+def processar_unificacao(chaves=None):
+    """
+    Atualiza a aba Consolidado.
+    Sem `chaves`, reconstrói a aba inteira. Com um conjunto de (Data, Técnico)
+    alterados na rodada, recalcula e regrava só essas linhas (modo incremental).
+    Se a aba Nomes mudar, rode uma reconstrução completa: as linhas antigas
+    continuam com o nome anterior. Com a exportação ligada, o histórico também vai para
+    Parquet/CSV e a aba pode guardar só a janela dos últimos dias (ver exportacao.py);
+    linhas que saem da janela deixam a aba na próxima reconstrução completa.
+    No fim, as abas KPI são atualizadas (ver indicadores.py).
+    """
+    if chaves is not None and not chaves:
+        return True
+    try:
+        # Modo incremental: só os meses das chaves alteradas saem do espelho
+        with etapa("snapshot") as registro:
+            snapshot = carregar_snapshot(None if chaves is None else {mes_competencia(data) for data, _ in chaves})
+            dados_com = snapshot["Comissoes"]
+            dados_aprov = snapshot["Aproveitamento"]
+            registro["linhas"] = len(dados_com or []) + len(dados_aprov or [])
+
+        if dados_com is None or dados_aprov is None: return False
+        # No incremental, um dos lados sem linhas nos meses pedidos é normal
+        if chaves is None and (not dados_com or not dados_aprov): return False
+
+        with etapa("merge") as registro:
+            df_final = montar_consolidado(
+                _df_registros(dados_com, ['Data Processamento', 'Sigla Técnico', 'Horas Vendidas']),
+                _df_registros(dados_aprov, ['Data', 'Técnico', 'Disp', 'TP', 'TG']),
+                chaves
+            )
+            registro["linhas"] = len(df_final)
+        if chaves is not None and df_final.empty:
+            return True
+
+        # 1. APLICAR AJUSTES (Valores Reais)
+        with etapa("ajustes", linhas=len(snapshot["Ajustes"] or [])):
+            df_final = aplicar_logica_ajustes(df_final, snapshot["Ajustes"])
+        
+        # 2. TRADUZIR NOMES (Maquiagem Final para o BI)
+        with etapa("tradução de nomes", linhas=len(df_final)):
+            df_final = aplicar_traducao_nomes(df_final, snapshot["Nomes"])
+
+        # 3. EXPORTAR O HISTÓRICO (com a janela ligada, a aba fica só com os últimos dias)
+        df_aba = df_final
+        try:
+            if exportar_consolidado(df_final, completo=chaves is None):
+                df_aba = na_janela(df_final)
+        except Exception as e:
+            avisar(f"Exportação do histórico falhou; o Consolidado recebe todas as linhas: {e}")
+
+        if chaves is not None:
+            if df_aba.empty or atualizar_linhas_por_chave("Consolidado", df_aba, ['Data', 'Técnico']):
+                tecnicos.registrar_consolidado(df_aba['Técnico'])
+                # 4. INDICADORES (só os períodos das datas alteradas)
+                return atualizar_indicadores({data for data, _ in chaves})
+            # Cabeçalho do Consolidado diferente do esperado: cai na reconstrução completa
+            return processar_unificacao()
+
+        atualizar_planilha_preservando_formato("Consolidado", df_aba)
+        tecnicos.registrar_consolidado(df_aba['Técnico'], completo=True)
+        return atualizar_indicadores()
+    except Exception as e:
+        avisar(f"Erro unificação: {e}")
+        return False
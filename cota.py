@@ -0,0 +1,145 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+# --- COTA DA API ---
+# Toda chamada do gspread passa por aqui (ClienteHTTPComCota é o http_client do cliente).
+# 1. Leituras e escritas do Sheets respeitam um orçamento por minuto (janela deslizante):
+#    quando ele acaba a chamada espera em vez de tomar 429.
+# 2. 429, 408, 5xx, cota do Drive e quedas de conexão são repetidos com espera
+#    exponencial com jitter. Anexos (values:append) só repetem quando a API
+#    certamente recusou a chamada, para não duplicar linhas.
+# 3. Contadores (chamadas, esperas e bytes trafegados) ficam disponíveis em estatisticas(),
+#    e os da thread atual em contadores_da_thread() (ver diagnostico.py).
+log = logging.getLogger("cota")
+LEITURAS_POR_MINUTO = int(os.environ.get("SHEETS_LEITURAS_POR_MINUTO", "60"))
+ESCRITAS_POR_MINUTO = int(os.environ.get("SHEETS_ESCRITAS_POR_MINUTO", "60"))
+MAX_TENTATIVAS = 6
+ESPERA_INICIAL = 1.0
+ESPERA_MAXIMA = 64.0
+
+CODIGOS_TRANSITORIOS = {408, 500, 502, 503, 504}
+MOTIVOS_COTA_DRIVE = {"usageLimits", "rateLimitExceeded", "userRateLimitExceeded"}
+
+class JanelaDeCota:
+    """No máximo `limite` chamadas em qualquer intervalo de `periodo` segundos."""
+    def __init__(self, limite, periodo=60.0):
+        self.limite = limite
+        self.periodo = periodo
+        self._chamadas = deque()
+        self._trava = threading.Lock()
+
+    def reservar(self):
+        """Bloqueia até haver orçamento e registra a chamada. Retorna os segundos esperados."""
+        esperado = 0.0
+        while True:
+            with self._trava:
+                agora = time.monotonic()
+                while self._chamadas and agora - self._chamadas[0] >= self.periodo:
+                    self._chamadas.popleft()
+                if len(self._chamadas) < self.limite:
+                    self._chamadas.append(agora)
+                    return esperado
+                espera = self.periodo - (agora - self._chamadas[0])
+            time.sleep(espera)
+            esperado += espera
+
+_janelas = {"leitura": JanelaDeCota(LEITURAS_POR_MINUTO), "escrita": JanelaDeCota(ESCRITAS_POR_MINUTO)}
+
+# --- CONTADORES ---
+_trava_contadores = threading.Lock()
+_contadores = {}
+_da_thread = threading.local()
+
+def _somar(**valores):
+    with _trava_contadores:
+        for nome, valor in valores.items():
+            _contadores[nome] = _contadores.get(nome, 0) + valor
+    if not hasattr(_da_thread, "contadores"):
+        _da_thread.contadores = {}
+    for nome, valor in valores.items():
+        _da_thread.contadores[nome] = _da_thread.contadores.get(nome, 0) + valor
+
+def contadores_da_thread():
+    """Cópia dos contadores só das chamadas feitas pela thread atual (nunca zerados)."""
+    return dict(getattr(_da_thread, "contadores", {}))
+
+def zerar_estatisticas():
+    with _trava_contadores:
+        _contadores.clear()
+        _contadores.update({
+            "leitura": 0, "escrita": 0, "drive": 0, "repeticoes": 0, "recusas_cota": 0,
+            "falhas": 0, "espera_cota_s": 0.0, "espera_repeticao_s": 0.0, "bytes_enviados": 0, "bytes_recebidos": 0,
+        })
+
+def estatisticas():
+    """Cópia dos contadores desde o início do processo (ou do último zerar_estatisticas)."""
+    with _trava_contadores:
+        return dict(_contadores)
+
+zerar_estatisticas()
+
+# --- CLIENTE HTTP ---
+def _tipo_chamada(metodo, url):
+    if "sheets.googleapis.com" not in url:
+        return "drive"
+    return "leitura" if metodo.upper() == "GET" else "escrita"
+
+def _cota_do_drive(erro):
+    try:
+        return any(e.get("reason") in MOTIVOS_COTA_DRIVE or e.get("domain") == "usageLimits" for e in erro.error.get("errors", []))
+    except AttributeError:
+        return False
+
+def _recusada_por_cota(erro):
+    # A API não executou nada: repetir é sempre seguro, até para anexos
+    return isinstance(erro, APIError) and (erro.code == 429 or (erro.code == 403 and _cota_do_drive(erro)))
+
+def _pode_repetir(erro, anexo):
+    if _recusada_por_cota(erro):
+        return True
+    if isinstance(erro, APIError) and erro.code not in CODIGOS_TRANSITORIOS:
+        return False
+    # Timeout/5xx/queda: a chamada pode ter sido aplicada e um anexo repetido duplicaria linhas
+    return not anexo
+
+def _espera(tentativa, erro):
+    try:
+        sugerida = float(erro.response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        sugerida = 0.0
+    exponencial = min(ESPERA_MAXIMA, ESPERA_INICIAL * 2 ** tentativa)
+    return max(sugerida, random.uniform(exponencial / 2, exponencial))
+
+class ClienteHTTPComCota(HTTPClient):
+    def request(self, method, endpoint, *args, **kwargs):
+        tipo = _tipo_chamada(method, endpoint)
+        anexo = ":append" in endpoint
+        for tentativa in range(MAX_TENTATIVAS):
+            if tipo in _janelas:
+                _somar(espera_cota_s=_janelas[tipo].reservar())
+            _somar(**{tipo: 1})
+            try:
+                resposta = super().request(method, endpoint, *args, **kwargs)
+                _somar(bytes_enviados=len(resposta.request.body or b""), bytes_recebidos=len(resposta.content))
+                if tipo == "escrita":
+                    # Cada escrita respondida sobe a versão da planilha (ver planilha._escrevendo)
+                    _somar(escritas_aplicadas=1)
+                return resposta
+            except (APIError, requests.ConnectionError, requests.Timeout) as erro:
+                if _recusada_por_cota(erro):
+                    _somar(recusas_cota=1)
+                if tentativa == MAX_TENTATIVAS - 1 or not _pode_repetir(erro, anexo):
+                    _somar(falhas=1)
+                    raise
+                espera = _espera(tentativa, erro)
+                log.warning("Sheets/Drive: %s - nova tentativa em %.1fs", erro, espera)
+                _somar(repeticoes=1, espera_repeticao_s=espera)
+                time.sleep(espera)
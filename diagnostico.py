@@ -0,0 +1,102 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from cota import contadores_da_thread
+
+# --- DIAGNÓSTICO DAS EXECUÇÕES ---
+# Cada etapa (decodificação, parse, leitura do upsert, merge, ajustes, tradução, escrita...)
+# registra tempo de parede, linhas tratadas, chamadas ao Sheets/Drive e bytes trafegados.
+# Chamadas e bytes vêm dos contadores da própria thread (cota.contadores_da_thread), então
+# outras sessões usando a API ao mesmo tempo não entram na conta. As etapas vão para a
+# Execucao ativa na thread (ex.: a da tarefa da fila) e sempre para o log.
+log = logging.getLogger("diagnostico")
+
+# Campo do registro -> contador do cota.py
+CAMPOS_API = {
+    "leituras": "leitura", "escritas": "escrita", "drive": "drive",
+    "bytes_enviados": "bytes_enviados", "bytes_recebidos": "bytes_recebidos",
+}
+
+_atual = threading.local()
+
+class Execucao:
+    """Etapas e avisos de uma rodada (um upload, uma unificação, um lote do CLI...)."""
+    def __init__(self, descricao):
+        self.descricao = descricao
+        self.iniciada_em = time.time()
+        self.etapas = []
+        self.avisos = []
+        self._trava = threading.Lock()
+
+    @contextmanager
+    def ativa(self):
+        """Enquanto ativa, as etapas e avisos da thread atual entram nesta execução."""
+        anterior = getattr(_atual, "execucao", None)
+        _atual.execucao = self
+        try:
+            yield self
+        finally:
+            _atual.execucao = anterior
+
+    def _anexar(self, lista, item):
+        with self._trava:
+            lista.append(item)
+
+    def para_dict(self):
+        with self._trava:
+            return {
+                "descricao": self.descricao,
+                "iniciada_em": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.iniciada_em)),
+                "etapas": [dict(e) for e in self.etapas],
+                "avisos": list(self.avisos),
+            }
+
+def exportar_json(execucoes):
+    return json.dumps([e.para_dict() for e in execucoes], ensure_ascii=False, indent=2)
+
+def _execucao_atual():
+    return getattr(_atual, "execucao", None)
+
+@contextmanager
+def etapa(nome, linhas=None):
+    """
+    Mede o bloco como uma etapa. O registro (dict) é devolvido para o bloco completar,
+    ex.: `with etapa("merge") as e: ...; e["linhas"] = len(df)`. Etapas podem ser aninhadas.
+    """
+    nivel = getattr(_atual, "nivel", 0)
+    registro = {"etapa": nome, "nivel": nivel, "linhas": linhas, "segundos": None, "erro": None}
+    execucao = _execucao_atual()
+    if execucao is not None:
+        # Entra na lista já na abertura: etapas aninhadas aparecem depois da que as contém
+        execucao._anexar(execucao.etapas, registro)
+
+    antes = contadores_da_thread()
+    inicio = time.perf_counter()
+    _atual.nivel = nivel + 1
+    try:
+        yield registro
+    except Exception as e:
+        registro["erro"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _atual.nivel = nivel
+        registro["segundos"] = round(time.perf_counter() - inicio, 4)
+        depois = contadores_da_thread()
+        for campo, contador in CAMPOS_API.items():
+            registro[campo] = depois.get(contador, 0) - antes.get(contador, 0)
+        log.info(
+            "%s%s: %.3fs, %s linha(s), %d leitura(s), %d escrita(s), %d B enviados, %d B recebidos%s",
+            "  " * nivel, nome, registro["segundos"], registro["linhas"] if registro["linhas"] is not None else "-",
+            registro["leituras"], registro["escritas"], registro["bytes_enviados"], registro["bytes_recebidos"],
+            f" (erro: {registro['erro']})" if registro["erro"] else ""
+        )
+
+def avisar(mensagem):
+    """Erro tratado (a rodada segue): vai para o log e para os avisos da execução ativa."""
+    log.warning(mensagem)
+    execucao = _execucao_atual()
+    if execucao is not None:
+        execucao._anexar(execucao.avisos, mensagem)
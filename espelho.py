@@ -0,0 +1,272 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# --- ESPELHO LOCAL DA PLANILHA (SQLite) ---
+# Cada aba fica guardada linha a linha, do jeito que get_all_values() devolve.
+# Regras de invalidação:
+#   1. A versão da planilha no Drive é consultada no máximo a cada INTERVALO_SONDAGEM
+#      segundos; se mudou (edição externa), o espelho inteiro é descartado.
+#   2. Escritas do próprio app atualizam o espelho (write-through) e só então
+#      adotam a nova versão, conferida depois de cada escrita.
+#   3. Nenhuma aba é servida com mais de IDADE_MAXIMA segundos, mesmo sem mudança detectada.
+# O índice chave -> número da linha de cada aba vive junto e cai sempre que a aba cai.
+# Idem para as partições por mês de competência (número da linha -> AAAA-MM), que deixam
+# ler só os meses de um upload em vez do histórico inteiro.
+CAMINHO_ESPELHO = os.environ.get("ESPELHO_PLANILHA", os.path.join(".cache", "espelho_planilha.sqlite"))
+INTERVALO_SONDAGEM = 20
+IDADE_MAXIMA = 15 * 60
+
+_trava = threading.Lock()
+
+@contextmanager
+def _conectar():
+    pasta = os.path.dirname(CAMINHO_ESPELHO)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    con = sqlite3.connect(CAMINHO_ESPELHO, timeout=30)
+    try:
+        with con:
+            con.execute("CREATE TABLE IF NOT EXISTS abas (nome TEXT PRIMARY KEY, baixada_em REAL)")
+            con.execute("CREATE TABLE IF NOT EXISTS linhas (aba TEXT, n INTEGER, valores TEXT, PRIMARY KEY (aba, n))")
+            con.execute("CREATE TABLE IF NOT EXISTS estado (chave TEXT PRIMARY KEY, valor TEXT)")
+            con.execute("CREATE TABLE IF NOT EXISTS indices (aba TEXT, colunas TEXT, cabecalho TEXT, PRIMARY KEY (aba, colunas))")
+            con.execute("CREATE TABLE IF NOT EXISTS chaves (aba TEXT, colunas TEXT, chave TEXT, n INTEGER, PRIMARY KEY (aba, colunas, chave))")
+            con.execute("CREATE TABLE IF NOT EXISTS particoes (aba TEXT, coluna TEXT, posicao INTEGER, PRIMARY KEY (aba, coluna))")
+            con.execute("CREATE TABLE IF NOT EXISTS meses (aba TEXT, coluna TEXT, n INTEGER, mes TEXT, PRIMARY KEY (aba, coluna, n))")
+            con.execute("CREATE INDEX IF NOT EXISTS meses_por_mes ON meses (aba, coluna, mes)")
+            yield con
+    finally:
+        con.close()
+
+def _ler_estado(con, chave):
+    linha = con.execute("SELECT valor FROM estado WHERE chave = ?", (chave,)).fetchone()
+    return linha[0] if linha else None
+
+def _gravar_estado(con, chave, valor):
+    con.execute("INSERT OR REPLACE INTO estado (chave, valor) VALUES (?, ?)", (chave, str(valor)))
+
+def _limpar(con, nome_aba=None):
+    if nome_aba is None:
+        for tabela in ("abas", "linhas", "indices", "chaves", "particoes", "meses"):
+            con.execute(f"DELETE FROM {tabela}")
+    else:
+        con.execute("DELETE FROM abas WHERE nome = ?", (nome_aba,))
+        for tabela in ("linhas", "indices", "chaves", "particoes", "meses"):
+            con.execute(f"DELETE FROM {tabela} WHERE aba = ?", (nome_aba,))
+
+def _aba_presente(con, nome_aba):
+    return con.execute("SELECT 1 FROM abas WHERE nome = ?", (nome_aba,)).fetchone() is not None
+
+def _aba_vigente(con, nome_aba):
+    # Como em ler(): aba além da IDADE_MAXIMA cai junto com o índice e as partições
+    aba = con.execute("SELECT baixada_em FROM abas WHERE nome = ?", (nome_aba,)).fetchone()
+    if aba is not None and time.time() - aba[0] > IDADE_MAXIMA:
+        _limpar(con, nome_aba)
+        return False
+    return aba is not None
+
+def _json(valores):
+    return json.dumps(list(valores), ensure_ascii=False)
+
+# --- VERSÃO / INVALIDAÇÃO ---
+def sondagem_vencida():
+    with _trava, _conectar() as con:
+        sondado_em = _ler_estado(con, "sondado_em")
+    return sondado_em is None or time.time() - float(sondado_em) >= INTERVALO_SONDAGEM
+
+def validar_versao(versao):
+    """
+    Compara a versão atual da planilha com a do espelho.
+    Se mudou por fora do app, descarta todas as abas. Retorna True se o espelho foi invalidado.
+    """
+    with _trava, _conectar() as con:
+        anterior = _ler_estado(con, "versao")
+        invalidou = anterior is not None and anterior != str(versao)
+        if invalidou:
+            _limpar(con)
+        _gravar_estado(con, "versao", versao)
+        _gravar_estado(con, "sondado_em", time.time())
+    return invalidou
+
+def versao_conhecida():
+    """Última versão da planilha registrada no espelho (sem ir ao Drive); None se nenhuma."""
+    with _trava, _conectar() as con:
+        return _ler_estado(con, "versao")
+
+def adotar_versao(versao):
+    """Registra a versão resultante de uma escrita do próprio app, sem invalidar nada."""
+    with _trava, _conectar() as con:
+        _gravar_estado(con, "versao", versao)
+        _gravar_estado(con, "sondado_em", time.time())
+
+def vencer_sondagem():
+    """A próxima leitura confere a versão da planilha antes de servir qualquer aba."""
+    with _trava, _conectar() as con:
+        con.execute("DELETE FROM estado WHERE chave = 'sondado_em'")
+
+def invalidar(nome_aba=None):
+    with _trava, _conectar() as con:
+        _limpar(con, nome_aba)
+        if nome_aba is None:
+            con.execute("DELETE FROM estado")
+
+# --- LEITURA / ESCRITA ---
+def carimbo(nome_aba):
+    """
+    Momento em que a aba entrou no espelho: identifica aquele conteúdo (escritas parciais
+    do app não mudam o carimbo). None se a aba não está no espelho ou passou da IDADE_MAXIMA.
+    """
+    with _trava, _conectar() as con:
+        aba = con.execute("SELECT baixada_em FROM abas WHERE nome = ?", (nome_aba,)).fetchone()
+    return aba[0] if aba is not None and time.time() - aba[0] <= IDADE_MAXIMA else None
+
+def tem_aba(nome_aba):
+    """A aba está no espelho e ainda dentro da IDADE_MAXIMA."""
+    return carimbo(nome_aba) is not None
+
+def ler(nome_aba):
+    """Valores da aba (lista de linhas) ou None se ela não está no espelho ou expirou."""
+    with _trava, _conectar() as con:
+        if not _aba_vigente(con, nome_aba):
+            return None
+        linhas = con.execute("SELECT valores FROM linhas WHERE aba = ? ORDER BY n", (nome_aba,)).fetchall()
+    return [json.loads(valores) for (valores,) in linhas]
+
+def substituir(nome_aba, valores):
+    """Guarda o conteúdo completo da aba (após um download ou uma regravação total)."""
+    with _trava, _conectar() as con:
+        _limpar(con, nome_aba)
+        con.execute("INSERT INTO abas (nome, baixada_em) VALUES (?, ?)", (nome_aba, time.time()))
+        con.executemany(
+            "INSERT INTO linhas (aba, n, valores) VALUES (?, ?, ?)",
+            [(nome_aba, n, json.dumps(linha)) for n, linha in enumerate(valores, start=1)]
+        )
+
+def atualizar_linhas(nome_aba, linhas_por_numero):
+    """
+    Write-through de escritas parciais: {número da linha na aba: valores}.
+    Células além do fim da nova linha continuam como estavam, igual na planilha.
+    """
+    with _trava, _conectar() as con:
+        if not _aba_presente(con, nome_aba):
+            return
+        novas = []
+        for n, linha in linhas_por_numero.items():
+            antiga = con.execute("SELECT valores FROM linhas WHERE aba = ? AND n = ?", (nome_aba, n)).fetchone()
+            antiga = json.loads(antiga[0]) if antiga else []
+            novas.append((nome_aba, n, json.dumps(list(linha) + antiga[len(linha):])))
+        con.executemany("INSERT OR REPLACE INTO linhas (aba, n, valores) VALUES (?, ?, ?)", novas)
+        _particionar(con, nome_aba, [(n, json.loads(valores)) for _, n, valores in novas])
+
+def anexar(nome_aba, linhas):
+    with _trava, _conectar() as con:
+        if not _aba_presente(con, nome_aba):
+            return
+        ultima = con.execute("SELECT COALESCE(MAX(n), 0) FROM linhas WHERE aba = ?", (nome_aba,)).fetchone()[0]
+        con.executemany(
+            "INSERT INTO linhas (aba, n, valores) VALUES (?, ?, ?)",
+            [(nome_aba, ultima + i, json.dumps(linha)) for i, linha in enumerate(linhas, start=1)]
+        )
+        # Linhas anexadas entram nos índices já montados da aba
+        for colunas, cabecalho in con.execute("SELECT colunas, cabecalho FROM indices WHERE aba = ?", (nome_aba,)).fetchall():
+            posicoes = [json.loads(cabecalho).index(c) for c in json.loads(colunas)]
+            con.executemany(
+                "INSERT OR IGNORE INTO chaves (aba, colunas, chave, n) VALUES (?, ?, ?, ?)",
+                [(nome_aba, colunas, _json(chave_da_linha(linha, posicoes)), ultima + i) for i, linha in enumerate(linhas, start=1)]
+            )
+        _particionar(con, nome_aba, [(ultima + i, linha) for i, linha in enumerate(linhas, start=1)])
+
+# --- ÍNDICE CHAVE -> LINHA ---
+def chave_da_linha(linha, posicoes):
+    return tuple(str(linha[p]) if p < len(linha) else "" for p in posicoes)
+
+def cabecalho_indice(nome_aba, colunas_chave):
+    """Cabeçalho da aba se o índice dessas colunas-chave está montado; senão None."""
+    with _trava, _conectar() as con:
+        if not _aba_vigente(con, nome_aba):
+            return None
+        linha = con.execute(
+            "SELECT cabecalho FROM indices WHERE aba = ? AND colunas = ?", (nome_aba, _json(colunas_chave))
+        ).fetchone()
+    return json.loads(linha[0]) if linha else None
+
+def montar_indice(nome_aba, colunas_chave, cabecalho, linha_por_chave):
+    """Guarda o índice {chave: número da linha}. Só vale enquanto a própria aba estiver no espelho."""
+    colunas = _json(colunas_chave)
+    with _trava, _conectar() as con:
+        if not _aba_presente(con, nome_aba):
+            return
+        con.execute("DELETE FROM chaves WHERE aba = ? AND colunas = ?", (nome_aba, colunas))
+        con.execute("INSERT OR REPLACE INTO indices (aba, colunas, cabecalho) VALUES (?, ?, ?)", (nome_aba, colunas, _json(cabecalho)))
+        con.executemany(
+            "INSERT INTO chaves (aba, colunas, chave, n) VALUES (?, ?, ?, ?)",
+            [(nome_aba, colunas, _json(chave), n) for chave, n in linha_por_chave.items()]
+        )
+
+def buscar_indice(nome_aba, colunas_chave, chaves):
+    """{chave: número da linha} só das chaves pedidas que existem na aba."""
+    colunas = _json(colunas_chave)
+    encontradas = {}
+    with _trava, _conectar() as con:
+        if not _aba_vigente(con, nome_aba):
+            return encontradas
+        for chave in chaves:
+            linha = con.execute(
+                "SELECT n FROM chaves WHERE aba = ? AND colunas = ? AND chave = ?", (nome_aba, colunas, _json(chave))
+            ).fetchone()
+            if linha:
+                encontradas[chave] = linha[0]
+    return encontradas
+
+# --- PARTIÇÕES POR MÊS DE COMPETÊNCIA ---
+def mes_competencia(data):
+    """'08/12/25' ou '8/12/2025' -> '2025-12' (mesma regra de padronizar_data_quatro_digitos); '' se não for data."""
+    partes = str(data).strip().split("/")
+    if len(partes) != 3:
+        return ""
+    _, mes, ano = partes
+    if len(ano) == 2:
+        ano = "20" + ano
+    return f"{ano}-{mes.zfill(2)}"
+
+def _particionar(con, nome_aba, linhas_numeradas):
+    # Mantém as partições já montadas da aba em dia com linhas novas ou regravadas
+    if any(n == 1 for n, _ in linhas_numeradas):
+        # Cabeçalho mudou: a posição da coluna pode ter mudado, remonta na próxima leitura
+        con.execute("DELETE FROM particoes WHERE aba = ?", (nome_aba,))
+        con.execute("DELETE FROM meses WHERE aba = ?", (nome_aba,))
+        return
+    for coluna, posicao in con.execute("SELECT coluna, posicao FROM particoes WHERE aba = ?", (nome_aba,)).fetchall():
+        con.executemany(
+            "INSERT OR REPLACE INTO meses (aba, coluna, n, mes) VALUES (?, ?, ?, ?)",
+            [(nome_aba, coluna, n, mes_competencia(linha[posicao]) if posicao < len(linha) else "") for n, linha in linhas_numeradas]
+        )
+
+def ler_meses(nome_aba, coluna, meses):
+    """
+    Cabeçalho + linhas da aba cujo mês de competência (coluna `coluna`) está em `meses`.
+    Linhas sem data reconhecível vêm sempre. None se a aba não está no espelho, expirou
+    ou não tem a coluna. A partição é montada na primeira leitura.
+    """
+    with _trava, _conectar() as con:
+        if not _aba_vigente(con, nome_aba):
+            return None
+        cabecalho = con.execute("SELECT valores FROM linhas WHERE aba = ? AND n = 1", (nome_aba,)).fetchone()
+        cabecalho = json.loads(cabecalho[0]) if cabecalho else []
+        if coluna not in cabecalho:
+            return None
+        if con.execute("SELECT 1 FROM particoes WHERE aba = ? AND coluna = ?", (nome_aba, coluna)).fetchone() is None:
+            con.execute("INSERT INTO particoes (aba, coluna, posicao) VALUES (?, ?, ?)", (nome_aba, coluna, cabecalho.index(coluna)))
+            linhas = con.execute("SELECT n, valores FROM linhas WHERE aba = ? AND n > 1", (nome_aba,)).fetchall()
+            _particionar(con, nome_aba, [(n, json.loads(valores)) for n, valores in linhas])
+        marcadores = ", ".join("?" for _ in meses)
+        linhas = con.execute(
+            f"SELECT l.valores FROM meses m JOIN linhas l ON l.aba = m.aba AND l.n = m.n "
+            f"WHERE m.aba = ? AND m.coluna = ? AND m.mes IN ('', {marcadores}) ORDER BY m.n",
+            (nome_aba, coluna, *meses)
+        ).fetchall()
+    return [cabecalho] + [json.loads(valores) for (valores,) in linhas]
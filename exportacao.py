@@ -0,0 +1,113 @@
+import os
+import shutil
+from datetime import date, timedelta
+
+import pandas as pd
+
+from diagnostico import avisar, etapa
+
+# --- EXPORTAÇÃO DO HISTÓRICO (PARQUET/CSV) ---
+# O Consolidado completo vai para EXPORTACAO_PASTA, um arquivo por mês
+# (consolidado/mes=AAAA-MM/dados.parquet via pyarrow, ou dados.csv.gz), para o BI ler o histórico
+# inteiro sem passar pelo Sheets. Reconstruções regravam todas as partições; unificações
+# incrementais só as dos meses alterados. Com CONSOLIDADO_JANELA_DIAS > 0, a aba
+# Consolidado guarda só os últimos N dias e os indicadores passam a ler o histórico daqui.
+PASTA_EXPORTACAO = os.environ.get("EXPORTACAO_PASTA", "")
+FORMATO_EXPORTACAO = os.environ.get("EXPORTACAO_FORMATO", "parquet")
+JANELA_DIAS = int(os.environ.get("CONSOLIDADO_JANELA_DIAS", "0"))
+
+ARQUIVOS = {"parquet": "dados.parquet", "csv": "dados.csv.gz"}
+COLUNAS_EXPORTADAS = ['Data', 'Técnico', 'Horas Vendidas', 'Disp', 'TP', 'TG']
+COLUNAS_CHAVE = ['Data', 'Técnico']
+
+def exportacao_ativa():
+    return bool(PASTA_EXPORTACAO)
+
+def janela_ativa():
+    """A janela só vale com a exportação ligada: é ela que passa a guardar o histórico."""
+    return JANELA_DIAS > 0 and exportacao_ativa()
+
+def _datas(serie):
+    return pd.to_datetime(serie.astype(str), format='%d/%m/%Y', errors='coerce')
+
+def na_janela(df):
+    """Linhas de df (Data dd/mm/aaaa) dos últimos JANELA_DIAS dias; sem data reconhecível, ficam."""
+    if not janela_ativa() or df.empty:
+        return df
+    inicio = pd.Timestamp(date.today() - timedelta(days=JANELA_DIAS - 1))
+    datas = _datas(df['Data'])
+    return df[datas.isna() | (datas >= inicio)]
+
+# --- PARTIÇÕES ---
+def _pasta_mes(mes):
+    return os.path.join(PASTA_EXPORTACAO, "consolidado", f"mes={mes}")
+
+def _meses_exportados():
+    pasta = os.path.join(PASTA_EXPORTACAO, "consolidado")
+    if not os.path.isdir(pasta):
+        return set()
+    return {nome[len("mes="):] for nome in os.listdir(pasta) if nome.startswith("mes=") and _arquivo_do_mes(nome[len("mes="):])}
+
+def _arquivo_do_mes(mes):
+    # Prefere o formato atual; uma partição gravada antes no outro formato ainda é lida
+    for formato in [FORMATO_EXPORTACAO] + [f for f in ARQUIVOS if f != FORMATO_EXPORTACAO]:
+        caminho = os.path.join(_pasta_mes(mes), ARQUIVOS[formato])
+        if os.path.exists(caminho):
+            return caminho
+    return None
+
+def _ler_mes(mes):
+    caminho = _arquivo_do_mes(mes)
+    if caminho.endswith(".parquet"):
+        return pd.read_parquet(caminho)
+    return pd.read_csv(caminho, compression="gzip", parse_dates=['Data'], dtype={'Técnico': str})
+
+def _gravar_mes(mes, df):
+    pasta = _pasta_mes(mes)
+    os.makedirs(pasta, exist_ok=True)
+    destino = os.path.join(pasta, ARQUIVOS[FORMATO_EXPORTACAO])
+    # Grava ao lado e troca de uma vez: o BI nunca lê um arquivo pela metade
+    temporario = destino + ".tmp"
+    if FORMATO_EXPORTACAO == "csv":
+        df.to_csv(temporario, index=False, date_format="%Y-%m-%d", compression="gzip")
+    else:
+        df.to_parquet(temporario, index=False, compression="zstd")
+    os.replace(temporario, destino)
+    for nome in ARQUIVOS.values():
+        if nome != ARQUIVOS[FORMATO_EXPORTACAO] and os.path.exists(os.path.join(pasta, nome)):
+            os.remove(os.path.join(pasta, nome))
+
+def exportar_consolidado(df_final, completo):
+    """
+    Grava df_final (colunas do Consolidado, Data dd/mm/aaaa) nas partições por mês.
+    `completo`: df_final é o histórico inteiro e meses que sumiram são apagados;
+    senão, é um upsert por (Data, Técnico) nos meses presentes.
+    Retorna False se a exportação está desligada.
+    """
+    if not exportacao_ativa():
+        return False
+    with etapa("exportação", linhas=len(df_final)) as registro:
+        df = df_final.reindex(columns=COLUNAS_EXPORTADAS).fillna(0.0)
+        df['Data'] = _datas(df['Data'])
+        df['Técnico'] = df['Técnico'].astype(str)
+        sem_data = df['Data'].isna()
+        if sem_data.any():
+            avisar(f"Exportação: {int(sem_data.sum())} linha(s) sem data reconhecível ficaram de fora.")
+            df = df[~sem_data]
+
+        meses = df['Data'].dt.strftime('%Y-%m')
+        existentes = _meses_exportados()
+        for mes, parte in df.groupby(meses):
+            if not completo and mes in existentes:
+                parte = pd.concat([_ler_mes(mes), parte], ignore_index=True).drop_duplicates(COLUNAS_CHAVE, keep='last')
+            _gravar_mes(mes, parte.sort_values(COLUNAS_CHAVE, kind='stable'))
+        if completo:
+            for mes in existentes - set(meses):
+                shutil.rmtree(_pasta_mes(mes))
+        registro["particoes"] = int(meses.nunique())
+    return True
+
+def ler_historico():
+    """Histórico exportado (Data em datetime), ou None se nada foi exportado ainda."""
+    partes = [_ler_mes(mes) for mes in sorted(_meses_exportados())]
+    return pd.concat(partes, ignore_index=True) if partes else None
@@ -0,0 +1,114 @@
+import pandas as pd
+
+from diagnostico import avisar, etapa
+from exportacao import janela_ativa, ler_historico
+from planilha import atualizar_linhas_por_chave, atualizar_planilha_preservando_formato, ler_valores_brutos
+
+# --- INDICADORES PRÉ-AGREGADOS (KPI) ---
+# Recalculados a partir do Consolidado a cada unificação, para o BI ler abas pequenas
+# (com a janela do Consolidado ligada, a partir do histórico exportado, ver exportacao.py):
+# - KPI Diario / KPI Semanal / KPI Mensal: totais por técnico e período (a semana começa na segunda);
+# - KPI Oficina: totais da oficina nos três níveis.
+# Eficiência = TP / TG e Produtividade = HV / Disp, sempre sobre as somas do período.
+# No modo incremental só os períodos que contêm as datas alteradas são recalculados e regravados.
+COLUNAS_SOMADAS = ['Horas Vendidas', 'Disp', 'TP', 'TG']
+ABAS_POR_NIVEL = {"Diário": "KPI Diario", "Semanal": "KPI Semanal", "Mensal": "KPI Mensal"}
+ABA_OFICINA = "KPI Oficina"
+
+def inicio_periodo(datas, nivel):
+    """Primeiro dia do período (dia, semana ou mês) de cada data."""
+    if nivel == "Semanal":
+        return datas - pd.to_timedelta(datas.dt.weekday, unit="D")
+    if nivel == "Mensal":
+        return datas.dt.to_period("M").dt.start_time
+    return datas
+
+def _razao(numerador, denominador):
+    # Período sem denominador fica em branco em vez de 0 ou infinito
+    razao = (numerador / denominador.where(denominador != 0)).round(4)
+    if razao.notna().all():
+        return razao
+    return razao.astype(object).where(razao.notna(), "")
+
+def _finalizar(df):
+    df['Período'] = df['Período'].dt.strftime('%d/%m/%Y')
+    df[COLUNAS_SOMADAS] = df[COLUNAS_SOMADAS].round(2)
+    df['Eficiência'] = _razao(df['TP'], df['TG'])
+    df['Produtividade'] = _razao(df['Horas Vendidas'], df['Disp'])
+    return df
+
+def _ler_consolidado():
+    # Com a janela ligada, a aba só tem os últimos dias: o histórico vem da exportação
+    if janela_ativa():
+        df = ler_historico()
+        return None if df is None else df[['Data', 'Técnico'] + COLUNAS_SOMADAS]
+
+    valores = ler_valores_brutos("Consolidado")
+    if not valores or valores == [[]]:
+        return None
+    cabecalho = valores[0]
+    if any(c not in cabecalho for c in ['Data', 'Técnico'] + COLUNAS_SOMADAS):
+        return None
+    corpo = [(list(l) + [""] * len(cabecalho))[:len(cabecalho)] for l in valores[1:]]
+    df = pd.DataFrame(corpo, columns=cabecalho)[['Data', 'Técnico'] + COLUNAS_SOMADAS]
+
+    df['Data'] = pd.to_datetime(df['Data'].astype(str), format='%d/%m/%Y', errors='coerce')
+    df = df[df['Data'].notna()].copy()
+    df['Técnico'] = df['Técnico'].astype(str)
+    for col in COLUNAS_SOMADAS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
+    return df
+
+def calcular_indicadores(df, datas=None):
+    """
+    {aba: DataFrame} com os totais de df (Consolidado com Data em datetime).
+    Com `datas`, só os períodos que contêm alguma delas.
+    """
+    indicadores, oficina = {}, []
+    for nivel, aba in ABAS_POR_NIVEL.items():
+        periodo = inicio_periodo(df['Data'], nivel)
+        parte = df.assign(**{'Período': periodo})
+        if datas is not None:
+            parte = parte[periodo.isin(inicio_periodo(datas, nivel))]
+
+        por_tecnico = parte.groupby(['Período', 'Técnico'], as_index=False)[COLUNAS_SOMADAS].sum()
+        indicadores[aba] = _finalizar(por_tecnico)
+
+        total = parte.groupby('Período', as_index=False).agg(
+            **{'Técnicos': ('Técnico', 'nunique')}, **{col: (col, 'sum') for col in COLUNAS_SOMADAS}
+        )
+        total.insert(0, 'Nível', nivel)
+        oficina.append(total)
+    indicadores[ABA_OFICINA] = _finalizar(pd.concat(oficina, ignore_index=True))
+    return indicadores
+
+def atualizar_indicadores(datas=None):
+    """
+    Regrava as abas KPI a partir do Consolidado. `datas` (dd/mm/aaaa) limita aos
+    períodos afetados; aba KPI ainda inexistente ou com outro cabeçalho é reconstruída.
+    """
+    with etapa("indicadores"):
+        return _atualizar_indicadores(datas)
+
+def _atualizar_indicadores(datas):
+    df = _ler_consolidado()
+    if df is None:
+        avisar("Indicadores: Consolidado vazio ou sem as colunas esperadas.")
+        return False
+
+    completos = None
+    if datas is not None:
+        datas = pd.to_datetime(pd.Series(sorted(datas), dtype=object), format='%d/%m/%Y', errors='coerce').dropna()
+        parciais = calcular_indicadores(df, datas)
+        for aba, parcial in parciais.items():
+            chaves = ['Nível', 'Período'] if aba == ABA_OFICINA else ['Período', 'Técnico']
+            if atualizar_linhas_por_chave(aba, parcial, chaves):
+                continue
+            if completos is None:
+                completos = calcular_indicadores(df)
+            atualizar_planilha_preservando_formato(aba, completos[aba])
+        return True
+
+    for aba, completo in calcular_indicadores(df).items():
+        atualizar_planilha_preservando_formato(aba, completo)
+    return True
@@ -0,0 +1,578 @@
+import codecs
+import html
+import multiprocessing
+import os
+import re
+import threading
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import lru_cache
+
+import streamlit as st
+from bs4 import BeautifulSoup
+
+from cache_arquivos import CacheResultados, calcular_chave
+from diagnostico import etapa
+
+try:
+    from lxml import etree
+except ImportError:  # sem lxml, só o motor BeautifulSoup fica disponível
+    etree = None
+
+# --- AUXILIARES ---
+def remover_acentos(texto):
+    if texto.isascii():  # nada a remover: evita o normalize em quase todas as linhas
+        return texto
+    return _sem_acentos(texto)
+
+@lru_cache(maxsize=1024)
+def _sem_acentos(texto):
+    # Linhas acentuadas se repetem (cabeçalho de cada mecânico): normaliza uma vez por valor
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+
+# --- MOTOR BEAUTIFULSOUP (árvore completa, referência) ---
+class _LinhaBs4:
+    __slots__ = ("tag",)
+
+    def __init__(self, tag):
+        self.tag = tag
+
+    def texto(self):
+        return self.tag.get_text(separator=" ", strip=True)
+
+    def celulas(self):
+        return [celula.get_text(strip=True) for celula in self.tag.find_all("td")]
+
+class DocumentoBs4:
+    def __init__(self, conteudo, guardar_texto=False):
+        self._soup = BeautifulSoup(conteudo, "html.parser")
+
+    def linhas(self):
+        for tr in self._soup.find_all("tr"):
+            yield _LinhaBs4(tr)
+
+    def texto_completo(self):
+        return self._soup.get_text(separator=" ", strip=True)
+
+# --- VALIDAÇÃO DA MARCAÇÃO ---
+# O html.parser (BeautifulSoup) e o libxml2 só montam as mesmas linhas quando o HTML é
+# bem formado: o html.parser não fecha <tr>/<td> implícitos (aninha a próxima linha dentro
+# da anterior) e os dois tratam fechamentos soltos de jeitos diferentes
+# (<td>ABD</font>X</td> dá "ABD" num e "ABDX" no outro). A validação não percorre o HTML
+# tag a tag: uma regex extrai só os nomes das tags ("html body table tr td /td ...") e as
+# regras (esqueleto tr/td, nada fechado dentro da linha sem ter sido aberto) são regex
+# sobre essa sequência curta. Comentários e <script>/<style> viram separadores (\x00),
+# como no BeautifulSoup. Documento recusado levanta MarcacaoAmbigua e desce de motor.
+class MarcacaoAmbigua(Exception):
+    """HTML que o html.parser e o libxml2 montariam de formas diferentes."""
+
+_TAGS_VAZIAS = "area|base|br|col|embed|hr|img|input|link|meta|param|source|track|wbr"
+_RE_BLOCOS = re.compile(r"<!--.*?-->|<(script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+# Mesma tag, capturando só o nome ("!" para declarações); fechamento com atributo não casa
+_RE_NOME_TAG = re.compile(
+    r"""<(/[a-zA-Z][a-zA-Z0-9]*(?=\s*>)|[a-zA-Z][a-zA-Z0-9]*(?=[\s/>])|!)[^<>"']*(?:(?:"[^<>"]*"|'[^<>']*')[^<>"']*)*>"""
+)
+
+# Regras sobre a sequência de nomes (minúsculos, cada um seguido de espaço)
+_RE_NOME_FORA = re.compile(r" (?:script|style|textarea|xmp|plaintext|/(?:%s)) " % _TAGS_VAZIAS)
+_RE_NOME_SEPARADOR = re.compile(r" (?:%s|!)(?= )" % _TAGS_VAZIAS)
+# Par abre/fecha sem outra tag no meio (fora as de tabela): o fechamento não afeta mais nada
+_RE_NOME_PAR = re.compile(r" ((?!t[dr] |table )[a-z][a-z0-9]*) /\1(?= )")
+_RE_NOME_FORA_TR_TD = re.compile(r" (?!/?t[dr] )\S+(?= )")
+_RE_ESQUELETO_VALIDO = re.compile(r" (?:tr (?:td /td )*/tr )*")
+# Dentro de uma linha: fechamento que não seja </td> (fecharia algo aberto fora da célula) ou tag de tabela
+_RE_NOME_LINHA_AMBIGUA = re.compile(r" tr (?:(?!/tr )\S+ )*?(?:/(?!t[dr] )|(?:table|thead|tbody|tfoot|caption|colgroup) )")
+
+def _sem_blocos(conteudo):
+    """Conteúdo com comentários e <script>/<style> trocados por \x00."""
+    if "<!--" in conteudo or "<![" in conteudo or "<?" in conteudo or re.search(r"<(?:script|style)\b", conteudo, re.IGNORECASE):
+        conteudo = _RE_BLOCOS.sub("\x00", conteudo)
+        if "<!--" in conteudo or "<![" in conteudo or "<?" in conteudo:
+            raise MarcacaoAmbigua("comentário sem fechamento, CDATA ou instrução de processamento")
+    return conteudo
+
+def _validar_nomes(nomes):
+    sequencia = " " + " ".join(nomes).lower() + " "
+    if _RE_NOME_FORA.search(sequencia):
+        raise MarcacaoAmbigua("script, bloco especial ou fechamento de tag vazia")
+    sequencia = _RE_NOME_SEPARADOR.sub("", sequencia)
+    while True:
+        reduzida = _RE_NOME_PAR.sub("", sequencia)
+        if reduzida == sequencia:
+            break
+        sequencia = reduzida
+    if not _RE_ESQUELETO_VALIDO.fullmatch(_RE_NOME_FORA_TR_TD.sub("", sequencia)):
+        raise MarcacaoAmbigua("<tr>/<td> aninhadas ou sem fechamento")
+    if _RE_NOME_LINHA_AMBIGUA.search(sequencia):
+        raise MarcacaoAmbigua("tag fechada dentro da linha sem ter sido aberta na mesma célula")
+
+def validar_marcacao(conteudo):
+    """Levanta MarcacaoAmbigua se o html.parser e o libxml2 puderem ler linhas diferentes."""
+    _validar_nomes(_RE_NOME_TAG.findall(_sem_blocos(conteudo)))
+
+# --- MOTOR LXML (streaming, sem árvore) ---
+# O parser HTML do lxml chama o "target" a cada tag/texto; só o texto das <tr>
+# é guardado e cada linha é descartada assim que o parser a consome.
+TAMANHO_BLOCO = 64 * 1024
+
+class _LinhaLxml:
+    __slots__ = ("partes", "partes_celulas")
+
+    def __init__(self):
+        self.partes = []
+        self.partes_celulas = []
+
+    def texto(self):
+        return " ".join(self.partes)
+
+    def celulas(self):
+        return ["".join(partes) for partes in self.partes_celulas]
+
+class _ColetorLxml:
+    def __init__(self, guardar_texto):
+        self.textos = [] if guardar_texto else None
+        self.prontas = deque()
+        self._pendentes = []
+        self._trs_abertas = []
+        self._tds_abertas = []
+        self._no_texto = []
+        self._em_script = 0
+
+    def _fechar_no_texto(self):
+        # Equivale a um NavigableString do bs4: texto contínuo entre duas tags
+        if not self._no_texto:
+            return
+        texto = "".join(self._no_texto).strip()
+        self._no_texto = []
+        if not texto:
+            return
+        if self.textos is not None:
+            self.textos.append(texto)
+        for linha in self._trs_abertas:
+            linha.partes.append(texto)
+        for celula in self._tds_abertas:
+            celula.append(texto)
+
+    def start(self, tag, attrib):
+        self._fechar_no_texto()
+        if tag in ("script", "style"):
+            self._em_script += 1
+        elif tag == "tr":
+            linha = _LinhaLxml()
+            self._trs_abertas.append(linha)
+            self._pendentes.append(linha)
+        elif tag == "td":
+            celula = []
+            self._tds_abertas.append(celula)
+            for linha in self._trs_abertas:
+                linha.partes_celulas.append(celula)
+
+    def end(self, tag):
+        self._fechar_no_texto()
+        if tag in ("script", "style"):
+            self._em_script = max(self._em_script - 1, 0)
+        elif tag == "tr" and self._trs_abertas:
+            self._trs_abertas.pop()
+            # Linhas aninhadas saem junto com a externa, na ordem de abertura (como o find_all)
+            if not self._trs_abertas:
+                self.prontas.extend(self._pendentes)
+                self._pendentes = []
+        elif tag == "td" and self._tds_abertas:
+            self._tds_abertas.pop()
+
+    def data(self, dados):
+        if not self._em_script:
+            self._no_texto.append(dados)
+
+    def comment(self, texto):
+        self._fechar_no_texto()
+
+    def close(self):
+        self._fechar_no_texto()
+        self.prontas.extend(self._pendentes)
+        self._pendentes = []
+
+class DocumentoLxml:
+    def __init__(self, conteudo, guardar_texto=False):
+        if etree is None:
+            raise MarcacaoAmbigua("lxml não instalado")
+        validar_marcacao(conteudo)
+        self._coletor = _ColetorLxml(guardar_texto)
+        self._parser = etree.HTMLParser(target=self._coletor)
+        self._blocos = (conteudo[i:i + TAMANHO_BLOCO] for i in range(0, len(conteudo), TAMANHO_BLOCO))
+        self._fechado = False
+
+    def _alimentar(self):
+        bloco = next(self._blocos, None)
+        if bloco is None:
+            self._parser.close()
+            self._fechado = True
+        else:
+            self._parser.feed(bloco)
+
+    def linhas(self):
+        prontas = self._coletor.prontas
+        while True:
+            while prontas:
+                yield prontas.popleft()
+            if self._fechado:
+                return
+            self._alimentar()
+
+    def texto_completo(self):
+        # Termina de ler o documento (o parser pode ter parado no total da filial)
+        while not self._fechado:
+            self._alimentar()
+            self._coletor.prontas.clear()
+        return " ".join(self._coletor.textos or [])
+
+# --- MOTOR RÁPIDO (regex sobre o texto, sem parser HTML) ---
+# Os relatórios do ERP são tabelas simples: com a marcação validada (<tr>/<td> bem
+# formadas e sem aninhamento), o texto de cada linha sai de um split nas tags. Além da
+# validação comum, todo '<' precisa abrir uma tag reconhecida e as entidades precisam
+# estar no formato que os dois parsers leem igual.
+# Com todo '<' e '>' numa tag reconhecida (sem '<'/'>' entre aspas), uma tag vai de '<' ao próximo '>'
+_RE_SEPARA_TEXTO = re.compile(r"<[^>]*>|\x00")
+_RE_AUTOFECHADA = re.compile(r"<(?!(?:%s)\b)[a-zA-Z][^<>]*/>" % _TAGS_VAZIAS, re.IGNORECASE)
+_RE_ENTIDADE_FORA = re.compile(r"&(?!(?:nbsp|amp|lt|gt|quot|#(?:3[2-9]|[4-9][0-9]|1[01][0-9]|12[0-6]|1[6-9][0-9]|[2-9][0-9]{2}|[1-9][0-9]{3}));)")
+
+_RE_LINHA = re.compile(r"<tr\b[^>]*>(.*?)</tr\s*>", re.IGNORECASE | re.DOTALL)
+_RE_CELULA = re.compile(r"<td\b[^>]*>(.*?)</td\s*>", re.IGNORECASE | re.DOTALL)
+
+def _textos(trecho):
+    """Textos não vazios entre as tags do trecho, já com as entidades (&amp; etc.) convertidas."""
+    partes = _RE_SEPARA_TEXTO.split(trecho)
+    if "&" in trecho:
+        partes = [html.unescape(parte) if "&" in parte else parte for parte in partes]
+    return list(filter(None, map(str.strip, partes)))
+
+class _LinhaRapida:
+    __slots__ = ("corpo",)
+
+    def __init__(self, corpo):
+        self.corpo = corpo
+
+    def texto(self):
+        return " ".join(_textos(self.corpo))
+
+    def celulas(self):
+        # Quase toda célula do ERP é só texto: sem tag nem entidade, basta o strip
+        return [
+            "".join(_textos(celula)) if "<" in celula or "&" in celula or "\x00" in celula else celula.strip()
+            for celula in _RE_CELULA.findall(self.corpo)
+        ]
+
+class DocumentoRapido:
+    def __init__(self, conteudo, guardar_texto=False):
+        if "\x00" in conteudo:
+            raise MarcacaoAmbigua("caractere nulo")
+        conteudo = _sem_blocos(conteudo)
+        nomes = _RE_NOME_TAG.findall(conteudo)
+        # Todo '<' e '>' precisa pertencer a uma tag reconhecida
+        if not len(nomes) == conteudo.count("<") == conteudo.count(">"):
+            raise MarcacaoAmbigua("'<' ou '>' fora de uma tag")
+        if "/>" in conteudo and _RE_AUTOFECHADA.search(conteudo):
+            raise MarcacaoAmbigua("tag autofechada")
+        if "&" in conteudo and _RE_ENTIDADE_FORA.search(conteudo):
+            raise MarcacaoAmbigua("entidade HTML fora do formato")
+        _validar_nomes(nomes)
+        # &nbsp; é de longe a entidade mais comum e não pode formar tag: converte uma vez só
+        self._conteudo = conteudo.replace("&nbsp;", "\xa0")
+
+    def linhas(self):
+        for corpo in _RE_LINHA.finditer(self._conteudo):
+            yield _LinhaRapida(corpo.group(1))
+
+    def texto_completo(self):
+        return " ".join(_textos(self._conteudo))
+
+MOTORES = {"bs4": DocumentoBs4, "lxml": DocumentoLxml, "rapido": DocumentoRapido}
+# Motor que assume quando um documento é recusado; o bs4 é a referência e aceita tudo
+SUBSTITUTOS = {"rapido": "lxml", "lxml": "bs4"}
+# O rápido é o padrão: com a mesma validação de marcação, lê os relatórios do ERP em menos
+# tempo que o lxml (benchmarks/bench_pipeline.py --motor); o lxml pega o que ele recusar
+MOTOR_PADRAO = os.environ.get("PARSE_MOTOR") or "rapido"
+
+def _ler_documento(extrator, conteudo, nome_arquivo, motor, guardar_texto=False):
+    """
+    Roda o extrator com o motor pedido. Se o motor recusar o HTML (formato inesperado,
+    marcação ambígua ou erro do libxml2), desce para o próximo: rapido -> lxml -> bs4.
+    """
+    while motor != "bs4":
+        try:
+            return extrator(MOTORES[motor](conteudo, guardar_texto), nome_arquivo)
+        except MarcacaoAmbigua:
+            pass
+        except Exception as e:
+            if etree is None or not isinstance(e, etree.LxmlError):
+                raise
+        motor = SUBSTITUTOS[motor]
+    return extrator(DocumentoBs4(conteudo, guardar_texto), nome_arquivo)
+
+# --- PARSERS (LEITURA) ---
+def _extrair_comissoes(doc, nome_arquivo):
+    dados = []
+    tecnico_atual = None
+    for linha in doc.linhas():
+        texto_linha = linha.texto().upper()
+        if "TOTAL DA FILIAL" in texto_linha or "TOTAL DA EMPRESA" in texto_linha: break
+
+        if "TOTAL DO FUNCIONARIO" in texto_linha:
+            try: tecnico_atual = texto_linha.split("TOTAL DO FUNCIONARIO")[1].replace(":", "").strip().split()[0]
+            except: continue
+
+        if tecnico_atual and "HORAS VENDIDAS:" in texto_linha:
+            for celula in linha.celulas():
+                txt = celula.upper()
+                if "HORAS" in txt and any(c.isdigit() for c in txt) and "VENDIDAS" not in txt:
+                    valor_limpo = txt.replace("HORAS", "").strip()
+                    dados.append([None, nome_arquivo, tecnico_atual, valor_limpo])
+                    break
+
+    # A data de competência pode estar em qualquer ponto do texto do relatório.
+    # Sem ela fica None: o resultado vai para o cache e "hoje" só é posto na leitura (_ler_lote)
+    match_data = re.search(r"até\s+(\d{2}/\d{2}/\d{4})", doc.texto_completo(), re.IGNORECASE)
+    data_relatorio = match_data.group(1) if match_data else None
+    for registro in dados:
+        registro[0] = data_relatorio
+    return dados
+
+def _extrair_aproveitamento(doc, nome_arquivo):
+    dados = []
+    tecnico_atual_aprov = None
+    for linha in doc.linhas():
+        texto_original = linha.texto().upper()
+        texto_limpo = remover_acentos(texto_original)
+
+        if "TOTAL FILIAL:" in texto_original: break
+        if "MECANICO" in texto_limpo and "TOT.MEC" not in texto_limpo:
+            try:
+                parte_direita = texto_limpo.split("MECANICO")[1].replace(":", "").strip()
+                if "-" in parte_direita: tecnico_atual_aprov = parte_direita.split("-")[0].strip()
+                else: tecnico_atual_aprov = parte_direita.split()[0]
+            except: continue
+
+        if "TOT.MEC.:" in texto_original: tecnico_atual_aprov = None; continue
+
+        if tecnico_atual_aprov:
+            celulas = linha.celulas()
+            if not celulas: continue
+            txt_cel0 = celulas[0]
+            if re.match(r"\d{2}/\d{2}/\d{2}", txt_cel0):
+                try:
+                    if len(celulas) >= 4:
+                        dados.append([
+                            txt_cel0.split()[0],
+                            nome_arquivo,
+                            tecnico_atual_aprov,
+                            celulas[1],
+                            celulas[2],
+                            celulas[3]
+                        ])
+                except: continue
+    return dados
+
+# --- CACHE DE ARQUIVOS JÁ LIDOS ---
+# Suba VERSAO_PARSER sempre que a lógica de extração mudar: isso invalida o cache.
+VERSAO_PARSER = 4
+
+_cache_resultados = CacheResultados()
+
+def _com_nome_arquivo(dados, nome_arquivo):
+    # O mesmo conteúdo pode voltar com outro nome; o nome é a coluna 1 nos dois parsers
+    return [[linha[0], nome_arquivo] + linha[2:] for linha in dados]
+
+def _com_data_de_hoje(dados):
+    # Relatório sem data de competência: vale o dia da leitura, nunca o do parse guardado no cache
+    if all(linha[0] is not None for linha in dados):
+        return dados
+    hoje = datetime.now().strftime("%d/%m/%Y")
+    return [[hoje] + linha[1:] if linha[0] is None else linha for linha in dados]
+
+# --- LEITURA EM LOTE (PARALELA) ---
+# Parse é CPU-bound: com muitos arquivos, cada um vai para um processo do pool.
+# Abaixo de MINIMO_ARQUIVOS_PARALELO o custo de despachar não compensa e tudo roda em série.
+TRABALHADORES_PARSE = int(os.environ.get("PARSE_TRABALHADORES", os.cpu_count() or 1))
+MINIMO_ARQUIVOS_PARALELO = 4
+
+_pool = None
+_trava_pool = threading.Lock()
+
+def _obter_pool(trabalhadores):
+    global _pool
+    with _trava_pool:
+        if _pool is None or _pool._max_workers != trabalhadores:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: o servidor do Streamlit tem threads, e fork com threads é arriscado
+            _pool = ProcessPoolExecutor(max_workers=trabalhadores, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _descartar_pool():
+    global _pool
+    with _trava_pool:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+def _ler_arquivo(tarefa):
+    extrator, nome_arquivo, conteudo, motor, guardar_texto = tarefa
+    try:
+        return _ler_documento(extrator, conteudo, nome_arquivo, motor, guardar_texto), None
+    except Exception as e:
+        return [], str(e)
+
+def _erro_na_tela(nome_arquivo, erro):
+    st.error(f"Erro no arquivo {nome_arquivo}: {erro}")
+
+def _ler_lote(arquivos, extrator, motor, guardar_texto, trabalhadores, ao_errar):
+    """
+    Lê os arquivos em série ou no pool, mas sempre devolve os dados (e reporta
+    os erros via ao_errar, por padrão st.error) na ordem original do upload.
+    """
+    if trabalhadores is None:
+        trabalhadores = TRABALHADORES_PARSE
+    if ao_errar is None:
+        ao_errar = _erro_na_tela
+
+    tipo = extrator.__name__.replace("_extrair_", "")
+    resultados = [None] * len(arquivos)
+    tarefas, posicoes, chaves = [], [], []
+    with etapa(f"decodificação {tipo}") as registro:
+        registro["bytes_lidos"] = 0
+        for i, arquivo in enumerate(arquivos):
+            try:
+                bruto = ler_bytes(arquivo)
+                registro["bytes_lidos"] += len(bruto)
+                chave = calcular_chave(bruto, extrator.__name__, motor, VERSAO_PARSER)
+                em_cache = _cache_resultados.obter(chave)
+                if em_cache is not None:
+                    resultados[i] = (_com_nome_arquivo(em_cache, arquivo.name), None)
+                    continue
+                tarefas.append((extrator, arquivo.name, decodificar_relatorio(bruto), motor, guardar_texto))
+                posicoes.append(i)
+                chaves.append(chave)
+            except Exception as e:
+                resultados[i] = ([], str(e))
+        registro["linhas"] = len(arquivos)
+        registro["em_cache"] = len(arquivos) - len(tarefas)
+
+    with etapa(f"parse {tipo}") as registro:
+        if trabalhadores > 1 and len(tarefas) >= MINIMO_ARQUIVOS_PARALELO:
+            try:
+                lidos = list(_obter_pool(trabalhadores).map(_ler_arquivo, tarefas))
+            except BrokenProcessPool:
+                _descartar_pool()
+                lidos = [_ler_arquivo(tarefa) for tarefa in tarefas]
+        else:
+            lidos = [_ler_arquivo(tarefa) for tarefa in tarefas]
+        registro["linhas"] = sum(len(dados) for dados, _ in lidos)
+    for i, chave, lido in zip(posicoes, chaves, lidos):
+        resultados[i] = lido
+        if lido[1] is None:
+            _cache_resultados.guardar(chave, lido[0])
+
+    dados = []
+    for arquivo, (dados_arquivo, erro) in zip(arquivos, resultados):
+        if erro is not None: ao_errar(arquivo.name, erro)
+        else: dados.extend(_com_data_de_hoje(dados_arquivo))
+    return dados
+
+# --- DECODIFICAÇÃO ---
+# Cada upload é lido uma vez só (memoryview sobre o buffer, sem cópia) e decodificado uma vez:
+# 1. BOM (UTF-8 / UTF-16) manda; amostra cheia de bytes nulos é UTF-16 sem BOM;
+# 2. UTF-8 válido vence (uma amostra barata evita tentar o arquivo inteiro nos Latin-1 do ERP);
+# 3. charset declarado no <meta> do começo do arquivo; o resto é Latin-1, que nunca falha.
+TAMANHO_AMOSTRA = 64 * 1024
+BOMS = [(codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")]
+_RE_META_CHARSET = re.compile(rb"""<meta[^>]*?charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+
+def ler_bytes(arquivo):
+    """Conteúdo do arquivo (UploadedFile/BytesIO ou similar) sem copiar quando possível."""
+    if hasattr(arquivo, "getbuffer"):
+        return arquivo.getbuffer()
+    arquivo.seek(0)
+    return memoryview(arquivo.read())
+
+def _charset_declarado(amostra):
+    m = _RE_META_CHARSET.search(amostra)
+    if not m:
+        return None
+    try: nome = codecs.lookup(m.group(1).decode("ascii")).name
+    except LookupError: return None
+    # Como nos navegadores: um <meta> legível em ASCII não pode estar em UTF-16/32
+    return None if nome.startswith(("utf-16", "utf-32")) else nome
+
+def _utf16_sem_bom(amostra):
+    # Texto ASCII em UTF-16 tem um byte nulo a cada dois; em Latin-1/UTF-8 quase nunca há nulos
+    pares, impares = amostra[0::2].count(0), amostra[1::2].count(0)
+    metade = len(amostra) // 2
+    if metade and impares > metade * 0.3 and pares < metade * 0.05:
+        return "utf-16-le"
+    if metade and pares > metade * 0.3 and impares < metade * 0.05:
+        return "utf-16-be"
+    return None
+
+def detectar_codificacao(bruto):
+    """Codificação do relatório, olhando só o BOM e os primeiros TAMANHO_AMOSTRA bytes."""
+    amostra = bytes(bruto[:TAMANHO_AMOSTRA])
+    for bom, codificacao in BOMS:
+        if amostra.startswith(bom):
+            return codificacao
+    utf16 = _utf16_sem_bom(amostra)
+    if utf16:
+        return utf16
+    try:
+        # final=False: a amostra pode cortar um caractere multibyte no meio
+        codecs.getincrementaldecoder("utf-8")().decode(amostra, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    return _charset_declarado(amostra) or "latin-1"
+
+def decodificar_relatorio(bruto):
+    """Texto do relatório a partir dos bytes (bytes ou memoryview), decodificando uma vez só."""
+    codificacao = detectar_codificacao(bruto)
+    try: return str(bruto, codificacao)
+    except UnicodeDecodeError: pass
+    # A amostra enganou (UTF-8 só no começo, por exemplo): tenta o charset declarado e depois Latin-1
+    declarado = _charset_declarado(bytes(bruto[:TAMANHO_AMOSTRA]))
+    if declarado and declarado != codificacao:
+        try: return str(bruto, declarado)
+        except UnicodeDecodeError: pass
+    return str(bruto, "latin-1")
+
+def parse_comissoes(arquivos, motor=MOTOR_PADRAO, trabalhadores=None, ao_errar=None):
+    return _ler_lote(arquivos, _extrair_comissoes, motor, True, trabalhadores, ao_errar)
+
+def parse_aproveitamento(arquivos, motor=MOTOR_PADRAO, trabalhadores=None, ao_errar=None):
+    return _ler_lote(arquivos, _extrair_aproveitamento, motor, False, trabalhadores, ao_errar)
+
+# --- CONFORMIDADE ENTRE MOTORES ---
+TIPOS_RELATORIO = {
+    "comissoes": (_extrair_comissoes, True),
+    "aproveitamento": (_extrair_aproveitamento, False),
+}
+
+def conferir_motores(arquivo, tipo):
+    """
+    Lê o arquivo em cada motor disponível, sem fallback, e compara com o BeautifulSoup.
+    Retorna {motor: "igual" | "diferente" | "recusou"}.
+    """
+    extrator, guardar_texto = TIPOS_RELATORIO[tipo]
+    conteudo = decodificar_relatorio(ler_bytes(arquivo))
+    referencia = extrator(DocumentoBs4(conteudo, guardar_texto), arquivo.name)
+    resultado = {}
+    for motor, documento in MOTORES.items():
+        if motor == "bs4":
+            continue
+        try:
+            dados = extrator(documento(conteudo, guardar_texto), arquivo.name)
+        except MarcacaoAmbigua:
+            resultado[motor] = "recusou"
+            continue
+        resultado[motor] = "igual" if dados == referencia else "diferente"
+    return resultado
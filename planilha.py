@@ -0,0 +1,594 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import gspread
+import streamlit as st
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2.service_account import Credentials
+from gspread.utils import ValueRenderOption, absolute_range_name, fill_gaps, rowcol_to_a1
+from requests.adapters import HTTPAdapter
+
+import espelho
+from cota import ClienteHTTPComCota, contadores_da_thread
+from diagnostico import avisar, etapa
+
+ID_PLANILHA_MESTRA = "1XibBlm2x46Dk5bf4JvfrMepD4gITdaOtTALSgaFcwV0"
+ESCOPOS = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+URL_DRIVE_ARQUIVOS = "https://www.googleapis.com/drive/v3/files/"
+VARIAVEL_ARQUIVO_CREDENCIAIS = "GCP_SERVICE_ACCOUNT_FILE"
+
+TAMANHO_POOL_HTTP = 10
+
+# Teto de células por requisição de escrita, bem abaixo do limite de tamanho do corpo da API
+MAX_CELULAS_POR_REQUISICAO = 50_000
+# Intervalos por values_batch_get ao conferir as células-chave (a URL leva todos eles)
+MAX_INTERVALOS_POR_LEITURA = 100
+SUFIXO_BRUTO = "::bruto"
+
+# --- CLIENTE ÚNICO DO PROCESSO ---
+def criar_credenciais(info=None):
+    """
+    Credenciais da service account: `info` explícito, o JSON apontado por
+    GCP_SERVICE_ACCOUNT_FILE (execução fora do Streamlit) ou st.secrets.
+    """
+    if info is None and os.environ.get(VARIAVEL_ARQUIVO_CREDENCIAIS):
+        return Credentials.from_service_account_file(os.environ[VARIAVEL_ARQUIVO_CREDENCIAIS], scopes=ESCOPOS)
+    if info is None:
+        info = st.secrets["gcp_service_account"]
+    return Credentials.from_service_account_info(info, scopes=ESCOPOS)
+
+@st.cache_resource(show_spinner=False)
+def conectar_sheets():
+    """
+    Cliente gspread compartilhado por todo o processo (e por todos os reruns).
+    Usa uma única sessão HTTP com pool de conexões reaproveitadas; a AuthorizedSession
+    renova o token sozinha quando ele expira.
+    """
+    creds = criar_credenciais()
+    sessao = AuthorizedSession(creds)
+    adaptador = HTTPAdapter(pool_connections=TAMANHO_POOL_HTTP, pool_maxsize=TAMANHO_POOL_HTTP)
+    sessao.mount("https://", adaptador)
+
+    # Toda chamada passa pelo controle de cota (espera, repetição e contadores)
+    return gspread.authorize(creds, http_client=ClienteHTTPComCota, session=sessao)
+
+@st.cache_resource(show_spinner=False)
+def abrir_planilha():
+    """Handle da planilha mestra (um único fetch de metadados por processo)."""
+    return conectar_sheets().open_by_key(ID_PLANILHA_MESTRA)
+
+# --- CACHE DE ABAS ---
+_abas = {}
+_trava_abas = threading.Lock()
+
+def _carregar_abas(sh):
+    # Uma única chamada de metadados traz todas as abas de uma vez
+    _abas.clear()
+    for ws in sh.worksheets():
+        _abas[ws.title] = ws
+
+def obter_aba(nome_aba, criar_com=None):
+    """
+    Retorna o handle da aba sem ir à API quando já conhecido.
+    criar_com=(linhas, colunas) cria a aba se ela não existir;
+    caso contrário, levanta gspread.WorksheetNotFound.
+    """
+    sh = abrir_planilha()
+    with _trava_abas:
+        if nome_aba not in _abas:
+            _carregar_abas(sh)
+        if nome_aba in _abas:
+            return _abas[nome_aba]
+        if criar_com is None:
+            raise gspread.WorksheetNotFound(nome_aba)
+        linhas, colunas = criar_com
+        ws = sh.add_worksheet(title=nome_aba, rows=linhas, cols=colunas)
+        _abas[nome_aba] = ws
+        return ws
+
+def esquecer_abas(nome_aba=None):
+    """Descarta os handles em cache (todos ou só o de `nome_aba`), ex.: aba renomeada/apagada fora do app."""
+    with _trava_abas:
+        if nome_aba is None:
+            _abas.clear()
+        else:
+            _abas.pop(nome_aba, None)
+
+def _aba_recusada(erro):
+    # WorksheetNotFound, ou 400 da API: intervalo/grade de uma aba que não existe mais com esse nome/id
+    return isinstance(erro, gspread.WorksheetNotFound) or (isinstance(erro, gspread.exceptions.APIError) and erro.code == 400)
+
+@contextmanager
+def _na_aba(nome_aba=None):
+    """Se a API recusar a aba, o handle em cache sai (todos, sem `nome_aba`) e a próxima chamada recarrega."""
+    try:
+        yield
+    except Exception as e:
+        if _aba_recusada(e):
+            esquecer_abas(nome_aba)
+        raise
+
+# --- LEITURA (VIA ESPELHO LOCAL) ---
+def _drive(caminho="", **params):
+    resposta = conectar_sheets().http_client.request("get", URL_DRIVE_ARQUIVOS + ID_PLANILHA_MESTRA + caminho, params=params)
+    return resposta.json()
+
+def versao_planilha():
+    """Versão da planilha no Drive: muda a cada edição, feita pelo app ou por fora."""
+    return _drive(fields="version")["version"]
+
+def _escritas_feitas():
+    """Requisições de escrita ao Sheets já respondidas nesta thread (ver cota.py)."""
+    return contadores_da_thread().get("escritas_aplicadas", 0)
+
+def _sincronizar_espelho(forcar=False):
+    if not forcar and not espelho.sondagem_vencida():
+        return
+    try:
+        espelho.validar_versao(versao_planilha())
+    except Exception:
+        # Sem como confirmar a versão, nada do espelho pode ser servido
+        espelho.invalidar()
+        raise
+
+def _chave_bruta(nome_aba):
+    # Os valores sem formatação de cada aba ficam no espelho sob um nome paralelo
+    return nome_aba + SUFIXO_BRUTO
+
+def _ler_pelo_espelho(chave, baixar):
+    try:
+        _sincronizar_espelho()
+    except Exception as e:
+        avisar(f"Espelho indisponível, lendo direto da planilha: {e}")
+        return baixar()
+
+    valores = espelho.ler(chave)
+    if valores is None:
+        valores = baixar()
+        espelho.substituir(chave, valores)
+    return valores
+
+def ler_valores(nome_aba):
+    """
+    Mesmo resultado de ws.get_all_values(), mas servido pelo espelho local
+    enquanto a planilha não muda. Levanta gspread.WorksheetNotFound se a aba não existe.
+    """
+    with _na_aba(nome_aba):
+        return _ler_pelo_espelho(nome_aba, lambda: obter_aba(nome_aba).get_all_values())
+
+def ler_valores_brutos(nome_aba):
+    """
+    Como ler_valores, mas sem formatação (números voltam como números).
+    É a base de comparação das escritas diferenciais.
+    """
+    with _na_aba(nome_aba):
+        return _ler_pelo_espelho(
+            _chave_bruta(nome_aba),
+            lambda: obter_aba(nome_aba).get_values(value_render_option=ValueRenderOption.unformatted)
+        )
+
+def carimbo_da_aba(nome_aba, brutos=False):
+    """
+    Identifica o conteúdo da aba guardado no espelho (ver espelho.carimbo), depois de
+    conferir a versão da planilha se a sondagem venceu. None se a aba não está no espelho.
+    """
+    try:
+        _sincronizar_espelho()
+        return espelho.carimbo(_chave_bruta(nome_aba) if brutos else nome_aba)
+    except Exception as e:
+        avisar(f"Espelho indisponível: {e}")
+        return None
+
+def versao_conferida():
+    """Versão da planilha registrada no espelho, conferida no Drive se a sondagem venceu. None se indisponível."""
+    try:
+        _sincronizar_espelho()
+        return espelho.versao_conhecida()
+    except Exception as e:
+        avisar(f"Espelho indisponível: {e}")
+        return None
+
+def ler_celula(nome_aba, celula):
+    """Valor formatado de uma célula (ex.: "B1"), direto da planilha."""
+    with _na_aba(nome_aba):
+        return obter_aba(nome_aba).acell(celula).value
+
+def _letra_da_coluna(posicao):
+    return rowcol_to_a1(1, posicao + 1)[:-1]
+
+def ler_coluna(nome_aba, nome_coluna, posicao_padrao=0):
+    """
+    Valores sem formatação da coluna `nome_coluna` (sem o cabeçalho). Vêm do espelho se a
+    aba já está nele; senão só o cabeçalho e a coluna são lidos, sem baixar a aba inteira.
+    Sem a coluna no cabeçalho, vale a da posição `posicao_padrao` (0 = A).
+    """
+    try:
+        _sincronizar_espelho()
+        valores = espelho.ler(_chave_bruta(nome_aba))
+    except Exception as e:
+        avisar(f"Espelho indisponível, lendo direto da planilha: {e}")
+        valores = None
+    if valores is not None:
+        cabecalho = valores[0] if valores else []
+        posicao = cabecalho.index(nome_coluna) if nome_coluna in cabecalho else posicao_padrao
+        return [l[posicao] if posicao < len(l) else "" for l in valores[1:]]
+
+    with _na_aba(nome_aba):
+        return _ler_coluna_da_planilha(nome_aba, nome_coluna, posicao_padrao)
+
+def _ler_coluna_da_planilha(nome_aba, nome_coluna, posicao_padrao):
+    obter_aba(nome_aba)  # levanta WorksheetNotFound
+    parametros = {"valueRenderOption": ValueRenderOption.unformatted}
+
+    def intervalo_da_coluna(posicao):
+        letra = _letra_da_coluna(posicao)
+        return absolute_range_name(nome_aba, f"{letra}2:{letra}")
+
+    # Cabeçalho e coluna provável numa chamada; só relê se a coluna estiver em outro lugar
+    resposta = abrir_planilha().values_batch_get(
+        [absolute_range_name(nome_aba, "1:1"), intervalo_da_coluna(posicao_padrao)], params=parametros
+    )
+    cabecalho, coluna = resposta.get("valueRanges", [{}, {}])
+    cabecalho = (cabecalho.get("values") or [[]])[0]
+    posicao = cabecalho.index(nome_coluna) if nome_coluna in cabecalho else posicao_padrao
+    if posicao != posicao_padrao:
+        coluna = abrir_planilha().values_batch_get([intervalo_da_coluna(posicao)], params=parametros)["valueRanges"][0]
+    return [l[0] if l else "" for l in coluna.get("values", [])]
+
+def _valores_do_intervalo(intervalo):
+    # Mesmo tratamento do ws.get_all_values(): linhas completadas até a largura da maior
+    try:
+        return fill_gaps(intervalo.get("values", [[]]))
+    except KeyError:
+        return [[]]
+
+def _abas_existentes(nomes_abas):
+    sh = abrir_planilha()
+    with _trava_abas:
+        if any(nome not in _abas for nome in nomes_abas):
+            _carregar_abas(sh)
+        return [nome for nome in nomes_abas if nome in _abas]
+
+def _baixar_em_lote(nomes_abas, forcar_versao):
+    """
+    Baixa com um único values_batch_get as abas da lista que não estão no espelho.
+    Devolve {aba: valores} do que foi baixado.
+    """
+    try:
+        _sincronizar_espelho(forcar=forcar_versao)
+        faltando = [nome for nome in nomes_abas if not espelho.tem_aba(nome)]
+        usar_espelho = True
+    except Exception as e:
+        avisar(f"Espelho indisponível, lendo direto da planilha: {e}")
+        faltando, usar_espelho = list(nomes_abas), False
+    if not faltando:
+        return {}
+
+    with _na_aba():
+        resposta = abrir_planilha().values_batch_get([absolute_range_name(nome) for nome in faltando])
+    baixados = {}
+    for nome, intervalo in zip(faltando, resposta.get("valueRanges", [])):
+        baixados[nome] = _valores_do_intervalo(intervalo)
+        if usar_espelho:
+            espelho.substituir(nome, baixados[nome])
+    return baixados
+
+def precarregar(nomes_abas):
+    """
+    Traz numa única chamada as abas da lista que não estão no espelho.
+    Falhar aqui não é erro: cada aba ainda pode ser lida sozinha depois.
+    """
+    try:
+        _baixar_em_lote(_abas_existentes(nomes_abas), forcar_versao=False)
+    except Exception as e:
+        avisar(f"Pré-carga das abas falhou: {e}")
+
+def ler_snapshot(nomes_abas, meses=None, particoes=None):
+    """
+    Valores de várias abas como estavam num mesmo instante: a versão da planilha é
+    conferida uma vez e tudo o que falta no espelho vem num único values_batch_get.
+    Com `meses` (AAAA-MM), as abas de `particoes` ({aba: coluna da data}) voltam só com
+    o cabeçalho e as linhas desses meses (mais as sem data reconhecível).
+    Retorna {aba: valores}; abas que não existem voltam como None.
+    """
+    particoes = particoes or {}
+    existentes = _abas_existentes(nomes_abas)
+    baixados = _baixar_em_lote(existentes, forcar_versao=True)
+    snapshot = {nome: None for nome in nomes_abas}
+    for nome in existentes:
+        if meses is not None and nome in particoes:
+            snapshot[nome] = espelho.ler_meses(nome, particoes[nome], meses)
+        if snapshot[nome] is None:
+            snapshot[nome] = baixados[nome] if nome in baixados else espelho.ler(nome)
+        if snapshot[nome] is None:
+            # Expirou entre a conferência e a leitura
+            snapshot[nome] = ler_valores(nome)
+    return snapshot
+
+def registros_de_valores(nome_aba, valores):
+    """Converte valores de uma aba em registros, como ws.get_all_records() (inclusive a conversão numérica)."""
+    if not valores or valores == [[]]:
+        return []
+    cabecalho = valores[0]
+    duplicados = [c for c in set(cabecalho) if cabecalho.count(c) > 1]
+    if duplicados:
+        raise gspread.exceptions.GSpreadException(f"Cabeçalho da aba {nome_aba} com colunas repetidas: {duplicados}")
+    corpo = [list(l) + [""] * (len(cabecalho) - len(l)) for l in valores[1:]]
+    return gspread.utils.to_records(cabecalho, [gspread.utils.numericise_all(l) for l in corpo])
+
+def ler_registros(nome_aba):
+    """Equivalente a ws.get_all_records() (inclusive a conversão numérica do gspread)."""
+    return registros_de_valores(nome_aba, ler_valores(nome_aba))
+
+def _somente_texto(linhas):
+    # Números gravados em RAW voltam formatados pelo locale da planilha ("12,5"),
+    # então só linhas 100% texto podem ir direto para o espelho sem nova leitura.
+    return all(isinstance(v, str) for linha in linhas for v in linha)
+
+@contextmanager
+def _escrevendo(nome_aba):
+    """
+    Envolve uma escrita: edições externas anteriores invalidam o espelho antes.
+    Cada requisição de escrita sobe a versão da planilha em 1, então a versão gerada
+    pela própria escrita só é adotada se for a anterior mais as escritas feitas aqui.
+    Se não for (alguém editou no meio), a aba sai do espelho e a próxima leitura volta
+    a conferir a versão, o que descarta o resto se a planilha mudou por fora.
+    """
+    antes = None
+    try:
+        _sincronizar_espelho(forcar=espelho.versao_conhecida() is None)
+        antes = espelho.versao_conhecida()
+    except Exception as e:
+        avisar(f"Espelho indisponível: {e}")
+    escritas = _escritas_feitas()
+    try:
+        with _na_aba(nome_aba):
+            yield
+    except Exception:
+        espelho.invalidar(nome_aba)
+        espelho.invalidar(_chave_bruta(nome_aba))
+        raise
+    try:
+        versao = versao_planilha()
+        if antes is not None and int(versao) == int(antes) + _escritas_feitas() - escritas:
+            espelho.adotar_versao(versao)
+            return
+    except Exception as e:
+        avisar(f"Versão da planilha não conferida depois da escrita: {e}")
+    espelho.invalidar(nome_aba)
+    espelho.invalidar(_chave_bruta(nome_aba))
+    espelho.vencer_sondagem()
+
+# --- GRAVAÇÃO ---
+def _mesmo_valor(atual, novo):
+    # Sem formatação, 12 e 12.0 chegam iguais; já "12" (texto) e 12 (número) são células diferentes
+    if isinstance(atual, str) != isinstance(novo, str) or isinstance(atual, bool) != isinstance(novo, bool):
+        return False
+    return atual == novo
+
+def _intervalos_alterados(linhas_atuais, linhas_novas, primeira_linha):
+    """
+    Compara linha a linha e devolve os trechos a regravar no formato do batch_update.
+    Linhas seguidas com o mesmo trecho de colunas alterado viram um único intervalo.
+    """
+    trechos = []
+    for i, (atual, nova) in enumerate(zip(linhas_atuais, linhas_novas)):
+        largura = max(len(atual), len(nova))
+        atual = list(atual) + [""] * (largura - len(atual))
+        nova = list(nova) + [""] * (largura - len(nova))
+        alteradas = [c for c in range(largura) if not _mesmo_valor(atual[c], nova[c])]
+        if alteradas:
+            trechos.append((primeira_linha + i, alteradas[0], alteradas[-1], nova))
+
+    intervalos = []
+    for linha, c0, c1, valores in trechos:
+        largura = c1 - c0 + 1
+        if intervalos:
+            anterior = intervalos[-1]
+            if (anterior['linha_fim'] == linha - 1 and anterior['colunas'] == (c0, c1)
+                    and (len(anterior['values']) + 1) * largura <= MAX_CELULAS_POR_REQUISICAO):
+                anterior['values'].append(valores[c0:c1 + 1])
+                anterior['linha_fim'] = linha
+                continue
+        intervalos.append({'linha_ini': linha, 'linha_fim': linha, 'colunas': (c0, c1), 'values': [valores[c0:c1 + 1]]})
+
+    return [{
+        'range': f"{rowcol_to_a1(t['linha_ini'], t['colunas'][0] + 1)}:{rowcol_to_a1(t['linha_fim'], t['colunas'][1] + 1)}",
+        'values': t['values']
+    } for t in intervalos]
+
+def _em_lotes(itens, celulas):
+    lote, total = [], 0
+    for item in itens:
+        n = celulas(item)
+        if lote and total + n > MAX_CELULAS_POR_REQUISICAO:
+            yield lote
+            lote, total = [], 0
+        lote.append(item)
+        total += n
+    if lote:
+        yield lote
+
+def _enviar_intervalos(ws, intervalos):
+    for lote in _em_lotes(intervalos, lambda i: sum(len(v) for v in i['values'])):
+        ws.batch_update(lote)
+
+def _anexar_em_lotes(ws, linhas):
+    for lote in _em_lotes(linhas, lambda l: max(len(l), 1)):
+        ws.append_rows(lote)
+
+def atualizar_planilha_preservando_formato(nome_aba, df_final):
+    """
+    Regrava a aba com o conteúdo de df_final sem esvaziá-la antes.
+    Compara com o conteúdo atual e envia só as células que mudaram; linhas a mais
+    vão para o fim e só as linhas que deixaram de existir são limpas. O cabeçalho
+    segue as colunas de df_final (ex.: indicadores novos ganham o seu rótulo).
+    """
+    with _escrevendo(nome_aba):
+        ws = obter_aba(nome_aba, criar_com=(2000, 20))
+
+        with etapa(f"leitura {nome_aba}") as registro:
+            valores_atuais = ler_valores_brutos(nome_aba)
+            registro["linhas"] = max(len(valores_atuais) - 1, 0)
+        cabecalho = df_final.columns.values.tolist()
+        if valores_atuais and valores_atuais != [[]]:
+            cabecalho_atual = valores_atuais[0]
+            corpo_atual = valores_atuais[1:]
+        else:
+            ws.update('A1', [cabecalho])
+            try: ws.format('A1:Z1', {'textFormat': {'bold': True}})
+            except: pass
+            cabecalho_atual = cabecalho
+            corpo_atual = []
+
+        # Preenche vazios com 0.0
+        df_final = df_final.fillna(0.0)
+        
+        dados_para_enviar = df_final.values.tolist()
+        n_atual, n_novo = len(corpo_atual), len(dados_para_enviar)
+
+        with etapa(f"escrita {nome_aba}", linhas=n_novo) as registro:
+            intervalos = (_intervalos_alterados([cabecalho_atual], [cabecalho], primeira_linha=1)
+                          + _intervalos_alterados(corpo_atual, dados_para_enviar, primeira_linha=2))
+            registro["celulas_alteradas"] = sum(len(v) for i in intervalos for v in i['values'])
+            _enviar_intervalos(ws, intervalos)
+            if n_novo > n_atual:
+                _anexar_em_lotes(ws, dados_para_enviar[n_atual:])
+            elif n_novo < n_atual:
+                largura = max([len(l) for l in corpo_atual[n_novo:]] + [1])
+                ws.batch_clear([f"A{n_novo + 2}:{rowcol_to_a1(n_atual + 1, largura)}"])
+
+        espelho.substituir(_chave_bruta(nome_aba), [cabecalho] + dados_para_enviar)
+        if _somente_texto(dados_para_enviar):
+            espelho.substituir(nome_aba, [cabecalho] + dados_para_enviar)
+        else:
+            espelho.invalidar(nome_aba)
+    return True
+
+def anexar_linhas(nome_aba, linhas, cabecalho=None):
+    """append_rows com write-through no espelho. Cria a aba com `cabecalho` se ela não existir."""
+    with _escrevendo(nome_aba):
+        try:
+            ws = obter_aba(nome_aba)
+        except gspread.WorksheetNotFound:
+            if cabecalho is None:
+                raise
+            ws = obter_aba(nome_aba, criar_com=(1000, 10))
+            ws.append_row(cabecalho)
+            espelho.substituir(nome_aba, [cabecalho])
+        ws.append_rows(linhas)
+        espelho.anexar(_chave_bruta(nome_aba), linhas)
+        if _somente_texto(linhas):
+            espelho.anexar(nome_aba, linhas)
+        else:
+            espelho.invalidar(nome_aba)
+
+def _indice_da_aba(nome_aba, colunas_chave):
+    """
+    (cabeçalho da aba, função que recebe chaves e devolve {chave: número da linha} das que existem).
+    Usa o índice persistente do espelho; só lê a aba inteira para montá-lo.
+    """
+    try:
+        _sincronizar_espelho()
+        cabecalho = espelho.cabecalho_indice(nome_aba, colunas_chave)
+    except Exception as e:
+        avisar(f"Índice indisponível: {e}")
+        cabecalho = None
+    if cabecalho is not None:
+        return cabecalho, lambda chaves: espelho.buscar_indice(nome_aba, colunas_chave, chaves)
+
+    valores = ler_valores(nome_aba)
+    if not valores or valores == [[]]:
+        return [], lambda chaves: {}
+    cabecalho = valores[0]
+    if any(c not in cabecalho for c in colunas_chave):
+        return cabecalho, lambda chaves: {}
+
+    posicoes = [cabecalho.index(c) for c in colunas_chave]
+    linha_por_chave = {}
+    for n, linha in enumerate(valores[1:], start=2):
+        linha_por_chave.setdefault(espelho.chave_da_linha(linha, posicoes), n)
+    espelho.montar_indice(nome_aba, colunas_chave, cabecalho, linha_por_chave)
+    return cabecalho, lambda chaves: {c: linha_por_chave[c] for c in chaves if c in linha_por_chave}
+
+def _chaves_divergentes(nome_aba, posicoes, linha_por_chave):
+    """
+    Lê na planilha as células-chave das linhas apontadas pelo índice (trechos de linhas
+    consecutivas, num values_batch_get) e devolve as chaves que não estão mais na sua linha.
+    """
+    trechos = []
+    for n in sorted(set(linha_por_chave.values())):
+        if trechos and n == trechos[-1][1] + 1:
+            trechos[-1][1] = n
+        else:
+            trechos.append([n, n])
+    ultima_coluna = max(posicoes) + 1
+    atuais = {}
+    for i in range(0, len(trechos), MAX_INTERVALOS_POR_LEITURA):
+        lote = trechos[i:i + MAX_INTERVALOS_POR_LEITURA]
+        intervalos = [absolute_range_name(nome_aba, f"A{a}:{rowcol_to_a1(b, ultima_coluna)}") for a, b in lote]
+        resposta = abrir_planilha().values_batch_get(intervalos)
+        for (a, b), intervalo in zip(lote, resposta.get("valueRanges", [])):
+            valores = intervalo.get("values", [])
+            for k, n in enumerate(range(a, b + 1)):
+                atuais[n] = espelho.chave_da_linha(valores[k] if k < len(valores) else [], posicoes)
+    return [chave for chave, n in linha_por_chave.items() if atuais.get(n) != chave]
+
+def atualizar_linhas_por_chave(nome_aba, df_linhas, colunas_chave):
+    """
+    Upsert de df_linhas pelas colunas-chave (ex.: Data, Técnico).
+    Chaves que já existem na aba são sobrescritas no lugar; chaves novas vão para o fim.
+    O custo depende só do número de linhas enviadas, não do tamanho da aba.
+    Retorna False quando a aba não existe ou o cabeçalho dela não tem exatamente as
+    colunas de df_linhas (aí só a regravação completa serve).
+    """
+    df_linhas = df_linhas.fillna(0.0).drop_duplicates(subset=colunas_chave, keep='last')
+    colunas = df_linhas.columns.values.tolist()
+
+    with _escrevendo(nome_aba):
+        with etapa(f"leitura do índice {nome_aba}", linhas=len(df_linhas)):
+            for tentativa in range(2):
+                try:
+                    cabecalho, buscar_linhas = _indice_da_aba(nome_aba, colunas_chave)
+                except gspread.WorksheetNotFound:
+                    return False
+                nomes = [c for c in cabecalho if c != ""]
+                if set(nomes) != set(colunas) or len(nomes) != len(set(nomes)):
+                    return False
+
+                # Linhas na ordem das colunas da aba
+                ordem = [colunas.index(c) if c != "" else None for c in cabecalho]
+                linhas = [[l[i] if i is not None else "" for i in ordem] for l in df_linhas.values.tolist()]
+                posicoes = [cabecalho.index(c) for c in colunas_chave]
+                chaves = [tuple(str(linha[p]) for p in posicoes) for linha in linhas]
+                linha_por_chave = buscar_linhas(chaves)
+
+                # Antes de sobrescrever pelo índice, confere se cada linha ainda tem a sua chave.
+                # Na segunda volta o índice acabou de ser montado da aba inteira.
+                if tentativa or not linha_por_chave or not _chaves_divergentes(nome_aba, posicoes, linha_por_chave):
+                    break
+                # Linhas movidas ou apagadas por fora: remonta o índice a partir da aba
+                espelho.invalidar(nome_aba)
+                espelho.invalidar(_chave_bruta(nome_aba))
+
+        atualizacoes, novas = [], []
+        for chave, linha in zip(chaves, linhas):
+            if chave in linha_por_chave:
+                atualizacoes.append({'range': f"A{linha_por_chave[chave]}", 'values': [linha]})
+            else:
+                novas.append(linha)
+
+        with etapa(f"escrita {nome_aba}", linhas=len(linhas)):
+            ws = obter_aba(nome_aba)
+            _enviar_intervalos(ws, atualizacoes)
+            _anexar_em_lotes(ws, novas)
+
+        espelho.atualizar_linhas(_chave_bruta(nome_aba), {int(a['range'][1:]): a['values'][0] for a in atualizacoes})
+        espelho.anexar(_chave_bruta(nome_aba), novas)
+        if _somente_texto(a['values'][0] for a in atualizacoes) and _somente_texto(novas):
+            espelho.atualizar_linhas(nome_aba, {int(a['range'][1:]): a['values'][0] for a in atualizacoes})
+            espelho.anexar(nome_aba, novas)
+        else:
+            espelho.invalidar(nome_aba)
+    return True
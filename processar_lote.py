@@ -0,0 +1,186 @@
+"""
+Execução em lote (sem navegador) da mesma rotina do app: lê os relatórios
+exportados, grava Comissões/Aproveitamento e reconsolida o BI.
+
+Exemplos:
+    python processar_lote.py --comissoes exportacoes/comissoes/ --aproveitamento "exportacoes/aprov/*.slk"
+    python processar_lote.py --credenciais conta_servico.json --comissoes "dez/**/*.html" --sem-gravar
+    python processar_lote.py --reconstruir --exportar historico/ --janela-dias 90
+"""
+import argparse
+import glob
+import io
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+from registros import TabelaCompacta
+
+EXTENSOES_RELATORIO = (".html", ".htm", ".slk", ".xls")
+TAMANHO_LOTE_PADRAO = 200
+
+log = logging.getLogger("processar_lote")
+
+class ArquivoLocal(io.BytesIO):
+    """Arquivo do disco com a mesma interface do UploadedFile do Streamlit (.name, .read, .seek)."""
+    def __init__(self, caminho):
+        with open(caminho, "rb") as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(caminho)
+
+def listar_arquivos(entradas):
+    """Expande pastas (só relatórios do primeiro nível) e globs, sem repetir e em ordem."""
+    caminhos = []
+    for entrada in entradas or []:
+        if os.path.isdir(entrada):
+            encontrados = [
+                os.path.join(entrada, nome) for nome in os.listdir(entrada)
+                if nome.lower().endswith(EXTENSOES_RELATORIO)
+            ]
+        else:
+            encontrados = glob.glob(entrada, recursive=True)
+            if not encontrados:
+                log.warning("Nada encontrado em %s", entrada)
+        caminhos.extend(c for c in sorted(encontrados) if os.path.isfile(c))
+    return list(dict.fromkeys(caminhos))
+
+def ler_relatorios(caminhos, parser, colunas, tamanho_lote, motor, trabalhadores):
+    """Roda o parser em lotes de `tamanho_lote` arquivos e devolve (TabelaCompacta, arquivos com erro)."""
+    dados, erros = [], []
+
+    def ao_errar(nome_arquivo, erro):
+        log.error("Erro no arquivo %s: %s", nome_arquivo, erro)
+        erros.append(nome_arquivo)
+
+    inicio = time.perf_counter()
+    for i in range(0, len(caminhos), tamanho_lote):
+        lote = caminhos[i:i + tamanho_lote]
+        arquivos = []
+        for caminho in lote:
+            try:
+                arquivos.append(ArquivoLocal(caminho))
+            except OSError as e:
+                ao_errar(os.path.basename(caminho), e)
+        dados.extend(parser(arquivos, motor=motor, trabalhadores=trabalhadores, ao_errar=ao_errar))
+        log.info("%d/%d arquivos lidos, %d linhas (%.1fs)", i + len(lote), len(caminhos), len(dados), time.perf_counter() - inicio)
+    return TabelaCompacta.de_linhas(dados, colunas), erros
+
+def conferir_arquivos(conferir_motores, arquivos_com, arquivos_aprov):
+    """Confere cada relatório nos motores de parse; retorna 1 se algum motor divergiu do BeautifulSoup."""
+    divergencias = 0
+    for tipo, caminhos in (("comissoes", arquivos_com), ("aproveitamento", arquivos_aprov)):
+        contagem = {}
+        for caminho in caminhos:
+            for motor, situacao in conferir_motores(ArquivoLocal(caminho), tipo).items():
+                contagem[(motor, situacao)] = contagem.get((motor, situacao), 0) + 1
+                if situacao == "diferente":
+                    divergencias += 1
+                    log.error("%s: motor %s diverge do BeautifulSoup", caminho, motor)
+        for (motor, situacao), total in sorted(contagem.items()):
+            log.info("%s / %s: %d arquivo(s) %s", tipo, motor, total, situacao)
+    return 1 if divergencias else 0
+
+def _argumentos(argv):
+    parser = argparse.ArgumentParser(description="Processa em lote os relatórios de Comissões e Aproveitamento.")
+    parser.add_argument("--comissoes", nargs="+", metavar="PASTA_OU_GLOB", help="relatórios de Comissões (HTML)")
+    parser.add_argument("--aproveitamento", nargs="+", metavar="PASTA_OU_GLOB", help="relatórios de Aproveitamento (HTML/SLK)")
+    parser.add_argument("--credenciais", help="JSON da service account (senão usa GCP_SERVICE_ACCOUNT_FILE ou os secrets do Streamlit)")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE_PADRAO, help="arquivos lidos por vez (padrão: %(default)s)")
+    parser.add_argument("--motor", choices=["rapido", "lxml", "bs4"], help="motor de parse (padrão: o do app)")
+    parser.add_argument("--trabalhadores", type=int, help="processos de parse (padrão: PARSE_TRABALHADORES ou nº de CPUs)")
+    parser.add_argument("--reconstruir", action="store_true", help="reconstrói o Consolidado inteiro no fim")
+    parser.add_argument("--sem-gravar", action="store_true", help="só lê e resume os arquivos, sem tocar na planilha")
+    parser.add_argument("--conferir", action="store_true", help="compara os motores de parse com o BeautifulSoup em cada arquivo, sem gravar")
+    parser.add_argument("--diagnostico", metavar="ARQUIVO_JSON", help="grava o tempo, as linhas e as chamadas à API de cada etapa")
+    parser.add_argument("--exportar", metavar="PASTA", help="exporta o histórico do Consolidado em Parquet/CSV (padrão: EXPORTACAO_PASTA)")
+    parser.add_argument("--janela-dias", type=int, metavar="N", help="dias mantidos na aba Consolidado, com a exportação ligada (padrão: CONSOLIDADO_JANELA_DIAS)")
+    args = parser.parse_args(argv)
+    if not args.comissoes and not args.aproveitamento and not args.reconstruir:
+        parser.error("informe --comissoes e/ou --aproveitamento (ou --reconstruir)")
+    if args.lote < 1:
+        parser.error("--lote precisa ser >= 1")
+    if args.janela_dias is not None and args.janela_dias < 0:
+        parser.error("--janela-dias precisa ser >= 0")
+    return args
+
+def main(argv=None):
+    args = _argumentos(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.credenciais:
+        os.environ["GCP_SERVICE_ACCOUNT_FILE"] = args.credenciais
+    if args.exportar:
+        os.environ["EXPORTACAO_PASTA"] = args.exportar
+    if args.janela_dias is not None:
+        os.environ["CONSOLIDADO_JANELA_DIAS"] = str(args.janela_dias)
+
+    # Importa depois de configurar as credenciais: os módulos do app leem o ambiente
+    from diagnostico import Execucao, exportar_json
+    from parsers import conferir_motores
+
+    if args.conferir:
+        return conferir_arquivos(conferir_motores, listar_arquivos(args.comissoes), listar_arquivos(args.aproveitamento))
+
+    execucao = Execucao("Processamento em lote")
+    try:
+        with execucao.ativa():
+            return _processar(args)
+    finally:
+        if args.diagnostico:
+            with open(args.diagnostico, "w", encoding="utf-8") as f:
+                f.write(exportar_json([execucao]))
+            log.info("Diagnóstico gravado em %s", args.diagnostico)
+
+def _processar(args):
+    from consolidacao import processar_unificacao
+    from cota import estatisticas
+    from parsers import MOTOR_PADRAO, parse_aproveitamento, parse_comissoes
+    from rotina import COLUNAS_APROVEITAMENTO, COLUNAS_COMISSOES, executar_rotina
+
+    motor = args.motor or MOTOR_PADRAO
+    tab_com = tab_aprov = None
+    erros = []
+
+    arquivos_com = listar_arquivos(args.comissoes)
+    if arquivos_com:
+        log.info("Comissões: %d arquivos", len(arquivos_com))
+        tab_com, erros_com = ler_relatorios(arquivos_com, parse_comissoes, COLUNAS_COMISSOES, args.lote, motor, args.trabalhadores)
+        erros += erros_com
+
+    arquivos_aprov = listar_arquivos(args.aproveitamento)
+    if arquivos_aprov:
+        log.info("Aproveitamento: %d arquivos", len(arquivos_aprov))
+        tab_aprov, erros_aprov = ler_relatorios(arquivos_aprov, parse_aproveitamento, COLUNAS_APROVEITAMENTO, args.lote, motor, args.trabalhadores)
+        erros += erros_aprov
+
+    if args.sem_gravar:
+        for nome, tab in (("Comissões", tab_com), ("Aproveitamento", tab_aprov)):
+            if tab is not None:
+                distintos = [len(np.unique(tab.coluna(tab.colunas[i]).valores)) for i in (2, 0)]
+                log.info("%s: %d linhas, %d técnicos, %d datas", nome, len(tab), *distintos)
+        return 1 if erros else 0
+
+    sucesso = True
+    if tab_com or tab_aprov:
+        sucesso = executar_rotina(tab_com, tab_aprov, lambda mensagem, progresso: log.info("[%3d%%] %s", progresso, mensagem))
+    elif not args.reconstruir:
+        log.warning("Nenhuma linha lida; nada a gravar.")
+
+    if args.reconstruir:
+        log.info("Reconstruindo o Consolidado inteiro...")
+        sucesso = processar_unificacao() and sucesso
+
+    uso = estatisticas()
+    log.info(
+        "API: %d leituras, %d escritas, %d repetições, %d recusas por cota (%.1fs esperando cota)",
+        uso["leitura"], uso["escrita"], uso["repeticoes"], uso["recusas_cota"], uso["espera_cota_s"]
+    )
+    if erros:
+        log.warning("%d arquivo(s) com erro: %s", len(erros), ", ".join(erros))
+    log.info("Concluído." if sucesso else "Concluído com erro na unificação.")
+    return 0 if sucesso and not erros else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
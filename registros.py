@@ -0,0 +1,130 @@
+import re
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# --- MODELO COMPACTO DAS LINHAS LIDAS ---
+# Os parsers devolvem listas de strings; aqui cada coluna vira um vetor NumPy:
+# - datas: número do dia (date.toordinal) em int32, com o formato original (dd/mm/aaaa ou dd/mm/aa);
+# - horas centesimais ("12,34"): inteiro em centésimos (1234), int64;
+# - o resto (técnico, arquivo...): código int32 num dicionário de strings internadas.
+# Só se usa data/centésimos quando TODOS os valores da coluna voltam idênticos ao texto
+# original; senão a coluna fica categórica. Assim o que vai para a planilha não muda,
+# e deduplicar/agrupar compara inteiros em vez de strings.
+FORMATOS_DATA = ["%d/%m/%Y", "%d/%m/%y"]
+_RE_CENTESIMAL = re.compile(r"^(-?)(\d+),(\d{2})$")
+
+DIAS, CENTESIMOS, CATEGORICA = "dias", "centesimos", "categorica"
+
+def _para_dia(texto, formato):
+    try: dia = datetime.strptime(texto, formato).date()
+    except ValueError: return None
+    return dia.toordinal() if dia.strftime(formato) == texto else None
+
+def _para_centesimos(texto):
+    m = _RE_CENTESIMAL.match(texto)
+    if not m: return None
+    valor = int(m.group(2)) * 100 + int(m.group(3))
+    valor = -valor if m.group(1) else valor
+    return valor if _formatar_centesimos(valor) == texto else None
+
+def _formatar_centesimos(valor):
+    sinal = "-" if valor < 0 else ""
+    return f"{sinal}{abs(valor) // 100},{abs(valor) % 100:02d}"
+
+class Coluna:
+    """Vetor de inteiros + como voltar ao texto (tipo, formato da data ou dicionário)."""
+    __slots__ = ("tipo", "valores", "formato", "dicionario")
+
+    def __init__(self, tipo, valores, formato=None, dicionario=None):
+        self.tipo = tipo
+        self.valores = valores
+        self.formato = formato
+        self.dicionario = dicionario
+
+    @classmethod
+    def de_textos(cls, textos):
+        # Interna primeiro: as conversões rodam uma vez por valor distinto, não por linha
+        codigos, distintos = pd.factorize(pd.Series([str(t) for t in textos], dtype=object), sort=False)
+        codigos = codigos.astype(np.int32)
+        distintos = list(distintos)
+
+        for formato in FORMATOS_DATA:
+            dias = [_para_dia(t, formato) for t in distintos]
+            if distintos and None not in dias:
+                return cls(DIAS, np.asarray(dias, dtype=np.int32)[codigos], formato=formato)
+
+        centesimos = [_para_centesimos(t) for t in distintos]
+        if distintos and None not in centesimos:
+            return cls(CENTESIMOS, np.asarray(centesimos, dtype=np.int64)[codigos])
+
+        return cls(CATEGORICA, codigos, dicionario=distintos)
+
+    def filtrar(self, posicoes):
+        return Coluna(self.tipo, self.valores[posicoes], self.formato, self.dicionario)
+
+    def textos(self):
+        """Strings originais, decodificando cada valor distinto uma vez só."""
+        if self.tipo == CATEGORICA:
+            return np.asarray(self.dicionario, dtype=object)[self.valores].tolist() if self.dicionario else []
+        distintos, inversos = np.unique(self.valores, return_inverse=True)
+        if self.tipo == DIAS:
+            texto = [date.fromordinal(int(d)).strftime(self.formato) for d in distintos]
+        else:
+            texto = [_formatar_centesimos(int(v)) for v in distintos]
+        return np.asarray(texto, dtype=object)[inversos.reshape(-1)].tolist()
+
+class TabelaCompacta:
+    """Linhas de um upload (Comissões ou Aproveitamento) guardadas por coluna."""
+    __slots__ = ("colunas", "_dados")
+
+    def __init__(self, colunas, dados):
+        self.colunas = list(colunas)
+        self._dados = dados
+
+    @classmethod
+    def de_linhas(cls, linhas, colunas):
+        return cls(colunas, {
+            nome: Coluna.de_textos([linha[i] for linha in linhas]) for i, nome in enumerate(colunas)
+        })
+
+    def __len__(self):
+        return len(self._dados[self.colunas[0]].valores) if self.colunas else 0
+
+    def coluna(self, nome):
+        return self._dados[nome]
+
+    def filtrar(self, posicoes):
+        """Só as linhas indicadas (posições ou máscara booleana)."""
+        return TabelaCompacta(self.colunas, {nome: col.filtrar(posicoes) for nome, col in self._dados.items()})
+
+    def mascara(self, nome, condicao):
+        """Máscara booleana de `condicao(texto)` na coluna, avaliada uma vez por valor distinto."""
+        valores = self._dados[nome].valores
+        distintos, inversos = np.unique(valores, return_inverse=True)
+        textos = Coluna(self._dados[nome].tipo, distintos, self._dados[nome].formato, self._dados[nome].dicionario).textos()
+        return np.array([bool(condicao(t)) for t in textos], dtype=bool)[inversos.reshape(-1)]
+
+    def _posicoes_unicas(self, colunas_chave, manter_ultima):
+        if not len(self):
+            return np.arange(0)
+        chaves = np.stack([self._dados[c].valores.astype(np.int64) for c in colunas_chave], axis=1)
+        if manter_ultima:
+            _, primeiras = np.unique(chaves[::-1], axis=0, return_index=True)
+            return np.sort(len(self) - 1 - primeiras)
+        _, primeiras = np.unique(chaves, axis=0, return_index=True)
+        return np.sort(primeiras)
+
+    def sem_duplicatas(self, colunas_chave):
+        """Mesmo resultado de drop_duplicates(subset=colunas_chave, keep='last'), comparando inteiros."""
+        return self.filtrar(self._posicoes_unicas(colunas_chave, manter_ultima=True))
+
+    def distintos(self, colunas):
+        """DataFrame (texto) com as combinações distintas das colunas, na ordem em que aparecem."""
+        return self.filtrar(self._posicoes_unicas(colunas, manter_ultima=False)).para_dataframe(colunas)
+
+    def para_dataframe(self, colunas=None):
+        """Volta ao DataFrame de strings que a planilha recebe (e que o app exibe)."""
+        colunas = self.colunas if colunas is None else colunas
+        return pd.DataFrame({nome: self._dados[nome].textos() for nome in colunas}, columns=colunas, dtype=object)
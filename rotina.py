@@ -0,0 +1,90 @@
+import os
+
+import pandas as pd
+
+from consolidacao import extrair_chaves, processar_unificacao
+from diagnostico import etapa
+from espelho import mes_competencia
+from planilha import atualizar_linhas_por_chave, atualizar_planilha_preservando_formato, ler_registros
+
+# --- LAYOUT DAS ABAS DE ENTRADA ---
+COLUNAS_COMISSOES = ["Data Processamento", "Nome do Arquivo", "Sigla Técnico", "Horas Vendidas"]
+COLUNAS_APROVEITAMENTO = ["Data", "Arquivo", "Técnico", "Disp", "TP", "TG"]
+CHAVES_COMISSOES = ["Data Processamento", "Sigla Técnico"]
+CHAVES_APROVEITAMENTO = ["Data", "Técnico"]
+
+# Meses fechados (até este AAAA-MM, inclusive) são só leitura: linhas de upload com datas neles são ignoradas
+FECHADO_ATE = os.environ.get("MESES_FECHADOS_ATE", "")
+
+# --- UPSERT ---
+def salvar_com_upsert(nome_aba, tabela, colunas_chaves):
+    # Dedup nos códigos inteiros da TabelaCompacta; o texto só é montado para as linhas que ficam
+    novos_dados_df = tabela.sem_duplicatas(colunas_chaves).para_dataframe()
+
+    # Caminho normal: só as linhas do upload são gravadas, via índice chave -> linha
+    if atualizar_linhas_por_chave(nome_aba, novos_dados_df, colunas_chaves):
+        return len(novos_dados_df)
+
+    # Aba nova ou com cabeçalho diferente: junta com o histórico e regrava tudo
+    try:
+        dados_antigos = ler_registros(nome_aba)
+        df_antigo = pd.DataFrame(dados_antigos)
+    except:
+        df_antigo = pd.DataFrame()
+
+    if not df_antigo.empty:
+        for col in df_antigo.columns: df_antigo[col] = df_antigo[col].astype(str)
+
+    df_total = pd.concat([df_antigo, novos_dados_df])
+    df_final = df_total.drop_duplicates(subset=colunas_chaves, keep='last')
+    
+    atualizar_planilha_preservando_formato(nome_aba, df_final)
+    return len(df_final)
+
+# --- ROTINA MESTRA ---
+def _informar_no_console(mensagem, progresso):
+    print(f"[{progresso:3d}%] {mensagem}")
+
+def _sem_meses_fechados(tabela, col_data, nome, informar):
+    if not tabela or not FECHADO_ATE: return tabela
+    abertas = tabela.mascara(col_data, lambda data: not "" < mes_competencia(data) <= FECHADO_ATE)
+    if not abertas.all():
+        informar(f"🔒 {nome}: {int((~abertas).sum())} linha(s) de meses fechados (até {FECHADO_ATE}) ignorada(s).", 0)
+    return tabela.filtrar(abertas)
+
+def _chaves_do_upload(tabela, col_data, col_tecnico):
+    if not tabela: return set()
+    return extrair_chaves(tabela.distintos([col_data, col_tecnico]), col_data, col_tecnico)
+
+def salvar_uploads(tab_com=None, tab_aprov=None, informar=_informar_no_console):
+    """
+    Grava os uploads (TabelaCompacta de Comissões/Aproveitamento, via upsert)
+    e devolve as chaves (Data, Técnico) que eles afetam.
+    """
+    tab_com = _sem_meses_fechados(tab_com, "Data Processamento", "Comissões", informar)
+    tab_aprov = _sem_meses_fechados(tab_aprov, "Data", "Aproveitamento", informar)
+    chaves = _chaves_do_upload(tab_com, "Data Processamento", "Sigla Técnico") | _chaves_do_upload(tab_aprov, "Data", "Técnico")
+
+    if tab_com:
+        informar("💾 Salvando Comissões...", 0)
+        with etapa("upsert Comissoes", linhas=len(tab_com)):
+            salvar_com_upsert("Comissoes", tab_com, CHAVES_COMISSOES)
+
+    if tab_aprov:
+        informar("💾 Salvando Aproveitamento...", 40)
+        with etapa("upsert Aproveitamento", linhas=len(tab_aprov)):
+            salvar_com_upsert("Aproveitamento", tab_aprov, CHAVES_APROVEITAMENTO)
+    return chaves
+
+def executar_rotina(tab_com=None, tab_aprov=None, informar=_informar_no_console):
+    """
+    Grava os uploads e reconsolida só as chaves (Data, Técnico) que vieram neles.
+    `informar(mensagem, progresso)` recebe o andamento, de 0 a 100.
+    Retorna True se a unificação deu certo; erros de gravação sobem como exceção.
+    """
+    chaves = salvar_uploads(tab_com, tab_aprov, informar)
+
+    informar("🔄 Unificando, Ajustando e Traduzindo Nomes...", 70)
+    sucesso = processar_unificacao(chaves)
+    informar("Unificação concluída." if sucesso else "Erro na unificação.", 100)
+    return sucesso
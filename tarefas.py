@@ -0,0 +1,135 @@
+import itertools
+import threading
+import time
+import traceback
+from collections import deque
+
+from consolidacao import processar_unificacao
+from diagnostico import Execucao
+from planilha import ID_PLANILHA_MESTRA
+
+# --- FILA DE TAREFAS EM SEGUNDO PLANO ---
+# Uma thread por planilha executa as gravações em ordem, fora do rerun do Streamlit:
+# o usuário não espera a API e um rerun no meio não corta uma escrita pela metade.
+# Pedidos de unificação ainda na fila são agrupados num só (chaves somadas; uma
+# reconstrução completa absorve qualquer pedido incremental).
+HISTORICO_TAREFAS = 20
+
+NA_FILA, EXECUTANDO, CONCLUIDA, ERRO = "na fila", "executando", "concluída", "erro"
+
+class Tarefa:
+    _ids = itertools.count(1)
+
+    def __init__(self, descricao, funcao, unificacao=False, chaves=None, diagnostico=None):
+        self.id = next(Tarefa._ids)
+        self.descricao = descricao
+        self.funcao = funcao
+        self.unificacao = unificacao
+        self.chaves = chaves
+        self.pedidos = 1
+        self.estado = NA_FILA
+        self.progresso = 0
+        self.mensagem = ""
+        self.criada_em = time.time()
+        self.terminada_em = None
+        # Etapas medidas enquanto a tarefa roda (ver diagnostico.py)
+        self.diagnostico = diagnostico or Execucao(descricao)
+
+    def informar(self, mensagem, progresso):
+        self.mensagem = mensagem
+        self.progresso = progresso
+
+    def ativa(self):
+        return self.estado in (NA_FILA, EXECUTANDO)
+
+class FilaTarefas:
+    def __init__(self, nome):
+        self.nome = nome
+        self._pendentes = deque()
+        self._historico = deque(maxlen=HISTORICO_TAREFAS)
+        self._condicao = threading.Condition()
+        self._thread = None
+
+    def _garantir_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._trabalhar, name=f"tarefas-{self.nome}", daemon=True)
+            self._thread.start()
+
+    def enfileirar(self, descricao, funcao, diagnostico=None):
+        """
+        `funcao(informar)` roda na thread da fila; retorno False marca a tarefa como erro.
+        `diagnostico` continua uma Execucao já iniciada (ex.: com o parse dos uploads).
+        """
+        tarefa = Tarefa(descricao, funcao, diagnostico=diagnostico)
+        with self._condicao:
+            self._pendentes.append(tarefa)
+            self._historico.append(tarefa)
+            self._garantir_thread()
+            self._condicao.notify()
+        return tarefa
+
+    def enfileirar_unificacao(self, chaves=None):
+        """
+        Pede uma unificação (chaves=None reconstrói tudo). Se já houver uma esperando
+        na fila, o pedido entra nela em vez de gerar outra rodada.
+        """
+        with self._condicao:
+            for tarefa in self._pendentes:
+                if tarefa.unificacao:
+                    if tarefa.chaves is not None:
+                        tarefa.chaves = None if chaves is None else tarefa.chaves | set(chaves)
+                    tarefa.pedidos += 1
+                    if tarefa.chaves is None:
+                        tarefa.descricao = tarefa.diagnostico.descricao = "Reconstruir Consolidado"
+                    return tarefa
+
+            tarefa = Tarefa(
+                "Reconstruir Consolidado" if chaves is None else "Atualizar Consolidado",
+                None, unificacao=True, chaves=None if chaves is None else set(chaves)
+            )
+            # As chaves são lidas só na hora de rodar, depois de todos os agrupamentos
+            tarefa.funcao = lambda informar: processar_unificacao(tarefa.chaves)
+            self._pendentes.append(tarefa)
+            self._historico.append(tarefa)
+            self._garantir_thread()
+            self._condicao.notify()
+        return tarefa
+
+    def _trabalhar(self):
+        while True:
+            with self._condicao:
+                while not self._pendentes:
+                    self._condicao.wait()
+                tarefa = self._pendentes.popleft()
+                tarefa.estado = EXECUTANDO
+            try:
+                with tarefa.diagnostico.ativa():
+                    resultado = tarefa.funcao(tarefa.informar)
+                tarefa.estado = ERRO if resultado is False else CONCLUIDA
+                if tarefa.estado == ERRO and not tarefa.mensagem:
+                    tarefa.mensagem = "A rotina terminou com erro (veja o log)."
+            except Exception as e:
+                traceback.print_exc()
+                tarefa.estado = ERRO
+                tarefa.mensagem = f"Erro: {e}"
+            if tarefa.estado == CONCLUIDA:
+                tarefa.progresso = 100
+            tarefa.terminada_em = time.time()
+
+    def tarefas(self):
+        """Histórico recente, da mais nova para a mais antiga."""
+        with self._condicao:
+            return list(reversed(self._historico))
+
+    def ocupada(self):
+        return any(t.ativa() for t in self.tarefas())
+
+_filas = {}
+_trava_filas = threading.Lock()
+
+def obter_fila(id_planilha=ID_PLANILHA_MESTRA):
+    """Fila única do processo para a planilha: todas as sessões do app compartilham a mesma."""
+    with _trava_filas:
+        if id_planilha not in _filas:
+            _filas[id_planilha] = FilaTarefas(id_planilha)
+        return _filas[id_planilha]
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+from planilha import carimbo_da_aba, ler_coluna, ler_valores, versao_conferida
+
+# --- DIRETÓRIO DE TÉCNICOS ---
+# Dicionário Sigla -> Nome (aba Nomes) e conjunto de técnicos do Consolidado, guardados
+# em memória. O dicionário vale enquanto a aba Nomes continuar com o mesmo carimbo no
+# espelho local: edição externa (nova versão da planilha), expiração ou regravação
+# completa trocam o carimbo e forçam uma nova montagem. O conjunto de técnicos vale
+# enquanto a versão da planilha não muda e, quando muda, só a coluna Técnico é relida.
+# Por VALIDADE_DIRETORIO segundos nada é conferido. As unificações do app mantêm o
+# conjunto em dia (registrar_consolidado), sem reler a coluna.
+VALIDADE_DIRETORIO = int(os.environ.get("TECNICOS_VALIDADE_S", "30"))
+
+_cache = {}
+_trava = threading.Lock()
+
+def _obter(nome_aba, montar, carimbar, conferir=False):
+    """Valor em cache da aba, ou o que `montar()` devolve quando `carimbar()` mudou."""
+    with _trava:
+        entrada = _cache.get(nome_aba)
+        if not conferir and entrada and time.monotonic() - entrada["conferido_em"] < VALIDADE_DIRETORIO:
+            return entrada["valor"]
+
+    carimbo = carimbar()
+    with _trava:
+        entrada = _cache.get(nome_aba)
+        if entrada and carimbo is not None and entrada["carimbo"] == carimbo:
+            entrada["conferido_em"] = time.monotonic()
+            return entrada["valor"]
+
+    valor = montar()
+    # A própria montagem pode ter baixado a aba para o espelho
+    carimbo = carimbar()
+    with _trava:
+        _cache[nome_aba] = {"carimbo": carimbo, "conferido_em": time.monotonic(), "valor": valor}
+    return valor
+
+def esquecer():
+    """Descarta o diretório (ex.: depois de trocar a planilha ou o espelho)."""
+    with _trava:
+        _cache.clear()
+
+# --- NOMES ---
+def montar_dicionario(linhas):
+    """Sigla (maiúscula, sem espaços nas pontas) -> Nome. A linha 1 é o cabeçalho."""
+    pares = ((str(l[0]).strip().upper(), str(l[1]).strip()) for l in linhas[1:] if len(l) >= 2)
+    return {sigla: nome for sigla, nome in pares if sigla and nome}
+
+def dicionario_nomes(linhas=None):
+    """
+    Dicionário da aba Nomes, montado uma vez por carimbo da aba. `linhas` (ex.: do snapshot
+    da unificação) dispensa a leitura e faz o carimbo ser conferido na hora.
+    """
+    return _obter(
+        "Nomes", lambda: montar_dicionario(ler_valores("Nomes") if linhas is None else linhas),
+        lambda: carimbo_da_aba("Nomes"), conferir=linhas is not None
+    )
+
+def traduzir_tecnicos(serie, dicionario):
+    """Troca siglas por nomes consultando o dicionário uma vez por valor distinto (categoria)."""
+    categorias = serie.astype("category")
+    mapa = {c: dicionario.get(str(c).strip().upper(), c) for c in categorias.cat.categories}
+    return categorias.map(mapa).astype(object)
+
+# --- TÉCNICOS DO CONSOLIDADO ---
+def _tecnicos_do_consolidado():
+    # Só a coluna Técnico (B, como no layout do Consolidado), não a tabela inteira
+    return frozenset(str(v) for v in ler_coluna("Consolidado", "Técnico", posicao_padrao=1) if v != "")
+
+def listar_tecnicos():
+    """Técnicos distintos do Consolidado, em ordem alfabética."""
+    return sorted(_obter("Consolidado", _tecnicos_do_consolidado, versao_conferida))
+
+def registrar_consolidado(tecnicos, completo=False):
+    """
+    Atualiza o conjunto depois de uma escrita do app no Consolidado: `completo` para a
+    regravação da aba inteira (o conjunto é substituído), senão só acrescenta (upsert).
+    """
+    # t == t descarta NaN
+    novos = frozenset(str(t) for t in tecnicos if t != "" and t == t)
+    carimbo = versao_conferida() if completo else None
+    with _trava:
+        entrada = _cache.get("Consolidado")
+        if completo:
+            _cache["Consolidado"] = {"carimbo": carimbo, "conferido_em": time.monotonic(), "valor": novos}
+        elif entrada is not None:
+            entrada["valor"] = entrada["valor"] | novos
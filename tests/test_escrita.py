@@ -0,0 +1,88 @@
+"""Escrita por diferença e upsert por chave contra a planilha falsa (benchmarks/planilha_falsa.py)."""
+import pandas as pd
+import pytest
+
+import planilha
+import planilha_falsa
+from rotina import CHAVES_APROVEITAMENTO, COLUNAS_APROVEITAMENTO
+
+ESCRITAS = ("update", "batch_update", "batch_clear", "append_rows", "append_row", "format", "add_worksheet")
+
+def linha(dia, tecnico, disp="8"):
+    return [f"{dia:02d}/03/24", "a.slk", tecnico, disp, "7", "6"]
+
+def quadro(linhas):
+    return pd.DataFrame(linhas, columns=COLUNAS_APROVEITAMENTO)
+
+@pytest.fixture
+def falsa(tmp_path):
+    linhas = [linha(d, t) for d in range(1, 6) for t in ("AAA", "BBB")]
+    return planilha_falsa.instalar({"Aproveitamento": [COLUNAS_APROVEITAMENTO] + linhas}, pasta_espelho=str(tmp_path))
+
+def escritas(falsa):
+    return {m: n for m, n in falsa.chamadas.items() if m in ESCRITAS and n}
+
+def test_quadro_igual_nao_escreve(falsa):
+    df = quadro([linha(d, "CCC") for d in range(1, 6)])
+    planilha.atualizar_planilha_preservando_formato("Consolidado", df)
+    assert falsa.abas["Consolidado"].valores() == [COLUNAS_APROVEITAMENTO] + df.values.tolist()
+
+    falsa.chamadas.clear()
+    planilha.atualizar_planilha_preservando_formato("Consolidado", df.copy())
+    assert escritas(falsa) == {}
+
+def test_quadro_menor_limpa_as_linhas_do_fim(falsa):
+    planilha.atualizar_planilha_preservando_formato("Consolidado", quadro([linha(d, "CCC") for d in range(1, 6)]))
+    falsa.chamadas.clear()
+
+    menor = quadro([linha(d, "CCC") for d in range(1, 4)])
+    planilha.atualizar_planilha_preservando_formato("Consolidado", menor)
+    assert falsa.chamadas["batch_clear"] == 1
+    assert falsa.abas["Consolidado"].valores() == [COLUNAS_APROVEITAMENTO] + menor.values.tolist()
+
+def test_cabecalho_novo_e_regravado(falsa):
+    df = quadro([linha(d, "CCC") for d in range(1, 3)])
+    planilha.atualizar_planilha_preservando_formato("Consolidado", df)
+
+    df["Extra"] = "x"
+    planilha.atualizar_planilha_preservando_formato("Consolidado", df)
+    assert falsa.abas["Consolidado"].valores()[0] == COLUNAS_APROVEITAMENTO + ["Extra"]
+
+def upsert(df):
+    return planilha.atualizar_linhas_por_chave("Aproveitamento", df, CHAVES_APROVEITAMENTO)
+
+def conferir_sem_duplicatas(falsa):
+    valores = falsa.abas["Aproveitamento"].valores()
+    chaves = [(l[0], l[2]) for l in valores[1:]]
+    assert len(chaves) == len(set(chaves))
+    return {(l[0], l[2]): l for l in valores[1:]}
+
+def test_upsert_sobrescreve_no_lugar_e_anexa_chaves_novas(falsa):
+    assert upsert(quadro([linha(2, "AAA", "1"), linha(9, "AAA", "2")]))
+    por_chave = conferir_sem_duplicatas(falsa)
+    assert por_chave[("02/03/24", "AAA")][3] == "1"
+    assert por_chave[("09/03/24", "AAA")][3] == "2"
+    assert len(por_chave) == 11
+
+@pytest.mark.parametrize("sondagem_vencida", [False, True])
+def test_upsert_depois_de_linha_inserida_por_fora_remonta_o_indice(falsa, sondagem_vencida):
+    # Monta o índice chave -> linha
+    assert upsert(quadro([linha(1, "AAA", "1")]))
+
+    # Linha inserida no topo direto na planilha: todas as outras descem uma posição
+    aba = falsa.abas["Aproveitamento"]
+    aba.linhas.insert(1, linha(20, "ZZZ", "5"))
+    falsa.editar(externa=True)
+    if sondagem_vencida:
+        planilha.espelho.vencer_sondagem()
+    antes = {k: v for k, v in conferir_sem_duplicatas(falsa).items() if k != ("03/03/24", "BBB")}
+
+    assert upsert(quadro([linha(3, "BBB", "9")]))
+    por_chave = conferir_sem_duplicatas(falsa)
+    assert por_chave.pop(("03/03/24", "BBB"))[3] == "9"
+    assert por_chave == antes
+
+    # O espelho do índice acompanha a aba: o próximo upsert também cai na linha certa
+    assert upsert(quadro([linha(4, "AAA", "7")]))
+    assert conferir_sem_duplicatas(falsa)[("04/03/24", "AAA")][3] == "7"
+    assert len(aba.valores()) == 12
@@ -0,0 +1,179 @@
+"""Os motores de parse precisam devolver exatamente as linhas do BeautifulSoup (referência)."""
+import io
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+import gerador
+import parsers
+from cache_arquivos import CacheResultados
+
+MOTORES_RAPIDOS = [m for m in parsers.MOTORES if m != "bs4" and not (m == "lxml" and parsers.etree is None)]
+
+CABECALHO = '<html><head><meta charset="utf-8"><title>Relatório</title></head><body><table>'
+RODAPE_APROVEITAMENTO = "<tr><td>TOTAL FILIAL:</td></tr></table></body></html>"
+
+def aproveitamento(*linhas):
+    """Relatório de Aproveitamento mínimo com as linhas (HTML de <tr>) dadas."""
+    return CABECALHO + "".join(linhas) + RODAPE_APROVEITAMENTO
+
+def dia(celula0, disp="8,00", tp="7,50", tg="6,00"):
+    return f"<tr><td>{celula0}</td><td>{disp}</td><td>{tp}</td><td>{tg}</td></tr>"
+
+def comissoes(*linhas, periodo="Período: 01/03/2024 até 31/03/2024"):
+    return (CABECALHO + f"<tr><td>{periodo}</td></tr>" + "".join(linhas)
+            + "<tr><td>TOTAL DA FILIAL</td></tr></table></body></html>")
+
+def total_funcionario(sigla, horas):
+    return (f"<tr><td colspan=3><b>TOTAL DO FUNCIONARIO: {sigla} - NOME</b></td></tr>"
+            f"<tr><td>HORAS VENDIDAS:</td><td>{horas} HORAS</td></tr>")
+
+# Marcação que o html.parser e o libxml2 podem montar de formas diferentes: o motor rápido
+# pode recusar (e descer para o bs4), mas nunca devolver outras linhas.
+CASOS_APROVEITAMENTO = {
+    "bem_formado": aproveitamento("<tr><td>MECÂNICO: ABC - JOÃO</td></tr>", dia("01/03/24 SEX")),
+    "fechamento_solto_na_celula": aproveitamento("<tr><td>MECANICO ABD</font>X</td></tr>", dia("01/03/24 SEX")),
+    "fechamento_solto_no_dia": aproveitamento("<tr><td>MECANICO ABD</td></tr>", dia("01/03/24</b> SEX")),
+    "fechamento_de_fora_da_linha": aproveitamento("<font><tr><td>MECANICO ABD</font>X</td></tr>", dia("01/03/24 SEX")),
+    "tag_aberta_na_celula": aproveitamento("<tr><td><b>MECANICO ABD</td></tr>", dia("01/03/24 <i>SEX")),
+    "td_sem_fechamento": aproveitamento("<tr><td>MECANICO ABD</tr>", "<tr><td>01/03/24 SEX<td>8,00<td>7,50<td>6,00</tr>"),
+    "tr_sem_fechamento": aproveitamento("<tr><td>MECANICO ABD</td>", dia("01/03/24 SEX")),
+    "tabela_aninhada": aproveitamento("<tr><td>MECANICO ABD<table><tr><td>X</td></tr></table></td></tr>", dia("01/03/24 SEX")),
+    "comentario_e_script": aproveitamento(
+        "<!-- <tr><td>MECANICO ZZZ</td></tr> --><tr><td>MECANICO ABD</td></tr>",
+        "<script>var t = '</td></tr>';</script>", dia("01/03/24 SEX")),
+    "comentario_sem_fechamento": aproveitamento("<tr><td>MECANICO ABD</td></tr><!-- ", dia("01/03/24 SEX")),
+    "entidades": aproveitamento("<tr><td>MECANICO A&amp;B - X&nbsp;Y</td></tr>", dia("01/03/24&nbsp;SEX", "8&#44;00")),
+    "entidade_sem_ponto_e_virgula": aproveitamento("<tr><td>MECANICO ABD &nbspX</td></tr>", dia("01/03/24 SEX")),
+    "menor_que_no_texto": aproveitamento("<tr><td>MECANICO ABD</td></tr>", dia("01/03/24 SEX", "< 8,00")),
+    "autofechada": aproveitamento("<tr><td>MECANICO <b/>ABD</td></tr>", dia("01/03/24 SEX<br/>")),
+    "maiusculas_e_atributos": aproveitamento('<TR class="x"><TD align=right>MECANICO ABD</TD></TR>', dia("01/03/24 SEX")),
+}
+
+CASOS_COMISSOES = {
+    "bem_formado": comissoes(total_funcionario("ABC", "12,50")),
+    "fechamento_solto_na_celula": comissoes(
+        "<tr><td colspan=3><b>TOTAL DO FUNCIONARIO: ABD</font>X - NOME</b></td></tr>"
+        "<tr><td>HORAS VENDIDAS:</td><td>10,00 HORAS</td></tr>"),
+    "fechamento_solto_nas_horas": comissoes(
+        "<tr><td>TOTAL DO FUNCIONARIO: ABD - NOME</td></tr>"
+        "<tr><td>HORAS VENDIDAS:</td><td>10,00</span>1 HORAS</td></tr>"),
+    "data_em_comentario": comissoes(total_funcionario("ABC", "12,50"), periodo="<!-- até 01/01/2020 -->Período: até 31/03/2024"),
+}
+
+def _como_arquivo(nome, conteudo):
+    arquivo = io.BytesIO(conteudo if isinstance(conteudo, bytes) else conteudo.encode("utf-8"))
+    arquivo.name = nome
+    return arquivo
+
+@pytest.fixture(autouse=True)
+def sem_cache_de_parse(monkeypatch):
+    monkeypatch.setattr(parsers, "_cache_resultados", CacheResultados(pasta=""))
+
+def _ler(parse, arquivos, motor):
+    erros = []
+    dados = parse([_como_arquivo(nome, conteudo) for nome, conteudo in arquivos], motor=motor,
+                  trabalhadores=1, ao_errar=lambda nome, erro: erros.append((nome, erro)))
+    assert not erros
+    return pd.DataFrame(dados)
+
+def _conferir_documento(tipo, conteudo, motor):
+    """Sem fallback: o motor recusa (MarcacaoAmbigua) ou devolve as mesmas linhas do bs4."""
+    extrator, guardar_texto = parsers.TIPOS_RELATORIO[tipo]
+    referencia = extrator(parsers.DocumentoBs4(conteudo, guardar_texto), "relatorio")
+    try:
+        dados = extrator(parsers.MOTORES[motor](conteudo, guardar_texto), "relatorio")
+    except parsers.MarcacaoAmbigua:
+        return None
+    assert dados == referencia
+    return dados
+
+@pytest.mark.parametrize("motor", MOTORES_RAPIDOS)
+@pytest.mark.parametrize("caso", sorted(CASOS_APROVEITAMENTO))
+def test_aproveitamento_igual_ao_bs4(caso, motor):
+    conteudo = CASOS_APROVEITAMENTO[caso]
+    _conferir_documento("aproveitamento", conteudo, motor)
+    arquivos = [(f"{caso}.html", conteudo)]
+    pd.testing.assert_frame_equal(
+        _ler(parsers.parse_aproveitamento, arquivos, motor), _ler(parsers.parse_aproveitamento, arquivos, "bs4")
+    )
+
+@pytest.mark.parametrize("motor", MOTORES_RAPIDOS)
+@pytest.mark.parametrize("caso", sorted(CASOS_COMISSOES))
+def test_comissoes_igual_ao_bs4(caso, motor):
+    conteudo = CASOS_COMISSOES[caso]
+    _conferir_documento("comissoes", conteudo, motor)
+    arquivos = [(f"{caso}.html", conteudo)]
+    pd.testing.assert_frame_equal(
+        _ler(parsers.parse_comissoes, arquivos, motor), _ler(parsers.parse_comissoes, arquivos, "bs4")
+    )
+
+@pytest.mark.parametrize("motor", MOTORES_RAPIDOS)
+def test_fechamento_solto_na_celula_nao_muda_o_tecnico(motor):
+    conteudo = CASOS_APROVEITAMENTO["fechamento_solto_na_celula"]
+    df = _ler(parsers.parse_aproveitamento, [("a.html", conteudo)], motor)
+    assert df[2].tolist() == ["ABD"]
+
+@pytest.mark.parametrize("motor", MOTORES_RAPIDOS)
+def test_bem_formado_nao_desce_para_o_bs4(motor):
+    assert _conferir_documento("aproveitamento", CASOS_APROVEITAMENTO["bem_formado"], motor) is not None
+    assert _conferir_documento("comissoes", CASOS_COMISSOES["bem_formado"], motor) is not None
+
+@pytest.fixture(scope="module")
+def lote_gerado():
+    return gerador.gerar_periodo(tecnicos=12, dias=70, inicio=date(2024, 1, 1))
+
+@pytest.mark.parametrize("motor", MOTORES_RAPIDOS)
+@pytest.mark.parametrize("tipo", ["comissoes", "aproveitamento"])
+def test_relatorios_gerados(lote_gerado, tipo, motor):
+    parse = parsers.parse_comissoes if tipo == "comissoes" else parsers.parse_aproveitamento
+    for _, conteudo in lote_gerado[tipo]:
+        # Os relatórios no formato do ERP são lidos pelo próprio motor, sem fallback
+        assert _conferir_documento(tipo, parsers.decodificar_relatorio(conteudo), motor) is not None
+    esperado = pd.DataFrame(lote_gerado["linhas_" + tipo])
+    pd.testing.assert_frame_equal(_ler(parse, lote_gerado[tipo], motor), esperado)
+    pd.testing.assert_frame_equal(_ler(parse, lote_gerado[tipo], "bs4"), esperado)
+
+@pytest.mark.parametrize("caso, lido_por", [
+    ("bem_formado", "rapido"),
+    ("menor_que_no_texto", "lxml"),
+    ("autofechada", "lxml"),
+    ("fechamento_solto_na_celula", "bs4"),
+])
+def test_motor_padrao_desce_ate_quem_aceita(monkeypatch, caso, lido_por):
+    if parsers.etree is None and lido_por == "lxml":
+        lido_por = "bs4"
+    usados = []
+
+    def registrando(nome, documento):
+        def criar(*args):
+            instancia = documento(*args)
+            usados.append(nome)
+            return instancia
+        return criar
+
+    monkeypatch.setattr(parsers, "MOTORES", {nome: registrando(nome, d) for nome, d in parsers.MOTORES.items()})
+    monkeypatch.setattr(parsers, "DocumentoBs4", registrando("bs4", parsers.DocumentoBs4))
+    _ler(parsers.parse_aproveitamento, [("a.html", CASOS_APROVEITAMENTO[caso])], "rapido")
+    assert usados == [lido_por]
+
+@pytest.mark.parametrize("caso", sorted(CASOS_APROVEITAMENTO))
+def test_conferir_motores_sem_divergencia(caso):
+    resultado = parsers.conferir_motores(_como_arquivo("a.html", CASOS_APROVEITAMENTO[caso]), "aproveitamento")
+    assert "diferente" not in resultado.values()
+
+def test_relatorio_sem_data_usa_o_dia_da_leitura_mesmo_em_cache(monkeypatch):
+    class Relogio(datetime):
+        agora = datetime(2024, 3, 31)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.agora
+
+    monkeypatch.setattr(parsers, "datetime", Relogio)
+    arquivos = [("sem_data.html", comissoes(total_funcionario("ABC", "12,50"), periodo="Período: março"))]
+    assert _ler(parsers.parse_comissoes, arquivos, "bs4")[0].tolist() == ["31/03/2024"]
+    Relogio.agora = datetime(2024, 4, 30)
+    # Mesmo conteúdo, agora servido pelo cache
+    assert _ler(parsers.parse_comissoes, arquivos, "bs4")[0].tolist() == ["30/04/2024"]
@@ -0,0 +1,49 @@
+"""A unificação incremental (só as chaves do upload) tem de chegar ao mesmo Consolidado da reconstrução completa."""
+import pytest
+
+import gerador
+import planilha_falsa
+from consolidacao import MAPA_METRICAS, processar_unificacao
+from registros import TabelaCompacta
+from rotina import COLUNAS_APROVEITAMENTO, COLUNAS_COMISSOES, salvar_uploads
+
+ENTRADAS = ("Comissoes", "Aproveitamento", "Ajustes", "Nomes")
+
+def resultado(falsa):
+    """Abas calculadas (Consolidado e indicadores), sem depender da ordem das linhas."""
+    return {
+        titulo: (aba.valores()[:1], sorted(aba.valores()[1:]))
+        for titulo, aba in falsa.abas.items() if titulo not in ENTRADAS
+    }
+
+@pytest.fixture
+def lote():
+    return gerador.gerar_periodo(4, 70, semente=7)
+
+def test_incremental_igual_a_reconstrucao(lote, tmp_path):
+    ultimo_com, ultimo_aprov = lote["comissoes"][-1][0], lote["aproveitamento"][-1][0]
+    abas = {
+        "Comissoes": [COLUNAS_COMISSOES] + [l for l in lote["linhas_comissoes"] if l[1] != ultimo_com],
+        "Aproveitamento": [COLUNAS_APROVEITAMENTO] + [l for l in lote["linhas_aproveitamento"] if l[1] != ultimo_aprov],
+        "Ajustes": gerador.gerar_ajustes(lote["linhas_aproveitamento"], list(MAPA_METRICAS), 30),
+        "Nomes": gerador.nomes_tecnicos(4),
+    }
+    falsa = planilha_falsa.instalar(abas, pasta_espelho=str(tmp_path / "incremental"))
+    assert processar_unificacao()
+
+    # Upload do último mês mais a correção de um dia que já estava no histórico
+    corrigida = list(abas["Aproveitamento"][5])
+    corrigida[3] = "1,50"
+    tab_com = TabelaCompacta.de_linhas([l for l in lote["linhas_comissoes"] if l[1] == ultimo_com], COLUNAS_COMISSOES)
+    tab_aprov = TabelaCompacta.de_linhas(
+        [corrigida] + [l for l in lote["linhas_aproveitamento"] if l[1] == ultimo_aprov], COLUNAS_APROVEITAMENTO
+    )
+    chaves = salvar_uploads(tab_com, tab_aprov, lambda mensagem, progresso: None)
+    assert chaves and processar_unificacao(chaves)
+
+    completa = planilha_falsa.instalar(
+        {titulo: falsa.abas[titulo].valores() for titulo in ENTRADAS}, pasta_espelho=str(tmp_path / "completa")
+    )
+    assert processar_unificacao()
+    assert resultado(falsa) == resultado(completa)
+    assert "Consolidado" in resultado(completa)